@@ -2,15 +2,22 @@ import os
 import re
 import glob
 from baseconfig import Config
+from sourcefile import SourceFile
+from values import typed
 
 
 class Apache(Config):
     conftype = "apache.conf"
     not_unique = ['LoadModule']
+    prefilter_words = ('include', '\\\n', '\\\r')
+    parser_version = 2
 
     def __init__(self, fname, options):
         Config.__init__(self, fname, options)
-        self.config = ApacheParser().parse(fname)
+        self.config = self.parse_cached(lambda: ApacheParser().parse(fname),
+                                        lambda config: config.includes if config else [])
+        if self.config is None:
+            raise Exception("No directives found in {}".format(fname))
 
     def find_nodes(self, name, context=None):
         """
@@ -26,11 +33,18 @@ class Apache(Config):
             return
 
         if not context:
-            return self.config.container.find_nodes(name)
+            return self.config.lookup(name)
         found = []
-        [found.extend(self.config.container.find_nodes(name, c)) for c in context]
+        [found.extend(self.config.lookup(name, c)) for c in context]
         return found
 
+    def dependencies(self):
+        return self.config.includes if self.config else []
+
+    @classmethod
+    def scan_finished(cls):
+        ApacheParser.clear_cache()
+
     def fill_missing_line(self, option, value, context=None):
         return option + " " + value
 
@@ -40,43 +54,59 @@ class Htaccess(Apache):
 
 
 class ApacheParser:
+    fragments = {}
+
     def __init__(self):
         self.container = Container()
         self.container.complete = True
         self.stack = [self.container]
+        self.includes = []
+        self.paths = {(): {}}
+        self.top = {}
+        self.container.indexes = [self.paths[()]]
+        self.unclosed = False
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Forget included files parsed during the scan
+        """
+        cls.fragments.clear()
 
-    def parse(self, path, this_fname=None):
+    def parse(self, path, this_fname=None, chain=None):
         """
         Load & parse configuration file
 
         @type  path: string
         @param path: configuration file path
+        @type  chain: tuple
+        @param chain: real paths of the files including this one
 
         @rtype: self
 
         @raise: Exception
         """
-        fp = open(path)
-        global flist
-        flist = []
-        container = self.stack.pop()
+        if chain is None:
+            chain = (os.path.realpath(path),)
+        container = start = self.stack.pop()
 
-        lineno = 0
-        for line in fp:
-            lineno = lineno + 1
+        text = SourceFile.open(path).text()
+        tokenize = self._get_node_instance
+        for lineno, line in self._logical_lines(text):
             line = line.strip()
             if not line:
                 continue
 
-            node = self._get_node_instance(line)
-            className = node.__class__.__name__
+            kind, node = tokenize(line)
 
-            if className == 'Container':
+            if kind == 'container':
+                node.path = container.path + (node.name.lower(),)
+                node.indexes = container.indexes + [self.paths.setdefault(node.path, {})]
                 self.stack.append(container)
                 container = node
                 continue
 
-            elif className == 'ContainerEnd':
+            elif kind == 'end':
                 if node.name.lower() != container.name.lower():
                     raise Exception('Unexpected directive name "%s"' % node.name)
 
@@ -84,50 +114,176 @@ class ApacheParser:
                 node = container
                 container = self.stack.pop()
 
-            elif className == 'Directive':
+            elif kind == 'directive':
                 name = node.name.lower()
                 node.lineno = lineno
                 node.line = line
-                if name == "include" or name == "includepptional":
-                    pattern = os.path.dirname(path) + '/' + node.value
+                if name == "include" or name == "includeoptional":
+                    pattern = os.path.join(os.path.dirname(path), node.value.strip('"'))
                     if pattern[-1:] == '/':
                         pattern += '*'
 
+                    self.includes.append(os.path.dirname(pattern))
                     for p in glob.glob(pattern):
-                        self.stack.append(container)
-                        if p.replace('/', '\\') in flist:
-                            flist.remove(p.replace('/', '\\'))
-                        self.parse(p, p)
+                        self.includes.append(p)
+                        self._include(p, container, chain)
 
                     continue
 
-            elif className == 'Comment':
+            elif kind == 'comment':
                 continue
 
             if this_fname:
                 node.source = os.path.normpath(this_fname)
-            container.addNode(node)
+            container.nodes.append(node)
+            if kind == 'directive':
+                for names in container.indexes:
+                    names.setdefault(name, []).append(node)
+                if container is self.container:
+                    self.top.setdefault(name, []).append(node)
+
+        if container is not start:
+            self.unclosed = True
+        if not this_fname and self.unclosed:
+            # directives of unclosed containers are not in the tree
+            self.paths, self.top = {(): {}}, {}
+            self._index_nodes(self.container.nodes, ())
 
         if not self.container.nodes:
             return None
 
         return self
 
+    def _include(self, fname, container, chain):
+        """
+        Add nodes of an included file to the container
+
+        An included file is parsed once per scan and its nodes are shared by every configuration
+        including it.
+
+        @type  fname: string
+        @param fname: included file path
+        @type  container: Container
+        @param container: container of the include directive
+        @type  chain: tuple
+        @param chain: real paths of the files including the directive
+
+        @raise: Exception
+        """
+        real = os.path.realpath(fname)
+        if real in chain:
+            raise Exception('Recursive include of "%s"' % fname)
+        key = (real, os.stat(real).st_mtime_ns)
+        try:
+            nodes, includes = self.fragments[key]
+        except KeyError:
+            parser = ApacheParser()
+            parser.parse(fname, fname, chain + (real,))
+            nodes, includes = self.fragments[key] = parser.container.nodes, parser.includes
+        self.includes.extend(includes)
+        container.nodes.extend(nodes)
+        self._index_nodes(nodes, container.path)
+
+    def lookup(self, name, context=None):
+        """
+        Find directives with the specified name in the index, ignoring case
+
+        @type  name: string
+        @param name: directive name
+        @type  context: string
+        @param context: name of the top level containers to search in, "ServerConfig" for directives
+                        outside of containers, or None for the whole configuration
+
+        @rtype: list
+        @return: list of matched directives in configuration order
+        """
+        if not context:
+            found = self.paths[()]
+        elif context == 'ServerConfig':
+            found = self.top
+        else:
+            found = self.paths.get((context.lower(),), {})
+        return list(found.get(name.lower(), []))
+
+    def _index(self, directive, path):
+        name = directive.name.lower()
+        for i in range(len(path) + 1):
+            self.paths.setdefault(path[:i], {}).setdefault(name, []).append(directive)
+        if not path:
+            self.top.setdefault(name, []).append(directive)
+
+    def _index_nodes(self, nodes, path):
+        for node in nodes:
+            if isinstance(node, Container):
+                self._index_nodes(node.nodes, path + (node.name.lower(),))
+            elif isinstance(node, Directive):
+                self._index(node, path)
+
+    def _logical_lines(self, text):
+        """
+        Split file contents to lines, joining lines continued with a trailing backslash
+
+        @rtype: iterable
+        @return: (number of the first physical line, logical line) pairs
+        """
+        lines = text.split('\n')
+        if '\\\n' not in text:
+            return enumerate(lines, 1)
+        ret = []
+        parts = []
+        for lineno, line in enumerate(lines, 1):
+            if line.endswith('\\'):
+                if not parts:
+                    first = lineno
+                parts.append(line[:-1])
+                continue
+            if parts:
+                parts.append(line)
+                ret.append((first, ''.join(parts)))
+                parts = []
+            else:
+                ret.append((lineno, line))
+        if parts:
+            ret.append((first, ''.join(parts)))
+        return ret
+
     def _get_node_instance(self, line):
         """
-        Search class for directive and return his instance
+        Tokenize a stripped line with a single match
 
         @type  line: string
         @param line: directive
 
-        @rtype:  Node
-        @return: matched instance
+        @rtype:  tuple
+        @return: token kind ("comment", "directive", "container", "end" or None) and its node
         """
-        node_classes = [Comment, Directive, Container, ContainerEnd, Node]
-        for cls in node_classes:
-            result = cls.match(line)
-            if result:
-                return result
+        match = LINE_RE.fullmatch(line)
+        if match is None:
+            node = Node()
+            node.value = line
+            return None, node
+        kind = match.lastgroup
+        if kind == 'directive':
+            node = Directive()
+            node.name, value = match.group('name', 'value')
+            node.value = typed(value)
+        elif kind == 'container':
+            node = Container()
+            node.name, node.value = match.group('container_name', 'container_value')
+        elif kind == 'end':
+            node = ContainerEnd()
+            node.name = match.group('end_name')
+        else:
+            node = None
+        return kind, node
+
+
+LINE_RE = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<directive>(?P<name>[A-Za-z_0-9]+)\s+(?P<value>.*))
+  | (?P<container><(?P<container_name>[A-Za-z_0-9]+)\s*(?P<container_value>.*)>)
+  | (?P<end></(?P<end_name>[A-Za-z_0-9]+)>)
+''', re.X)
 
 
 class Node:
@@ -238,6 +394,7 @@ class Directive(Node):
 class Container(Node):
     matchRe = re.compile(r'^<(?P<name>[A-Za-z_0-9]+)\s*(?P<value>.*)>$')
     fname = None
+    path = ()
 
     def __init__(self):
         self.complete = False
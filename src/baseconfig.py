@@ -1,43 +1,130 @@
-import json
 import os
-import sys
+from parsecache import ParseCache
+from prefilter import Prefilter
+from rules import RuleSet
+from sourcefile import SourceFile
 
 
 class Config:
     conftype = ''
     not_unique = []
+    # bump when the parsed configuration changes, so results in the parse cache are not used
+    parser_version = 1
+    # words that make the prefilter keep every query, e.g. directives reading options from other files
+    prefilter_words = ()
+    _prefilters = {}
 
     def __init__(self, fname, options):
         self.source = fname
-        self.rules = []
-        self._load_inner_rules()
-        if options.user_rules:
-            self.rules.extend(self._get_user_rules(self.load_rules(options.user_rules)))
-
-    def getappdir(self):
-        if getattr(sys, 'frozen', False):
-            application_path = os.path.dirname(sys.executable)
-            prod = os.path.join(application_path, '../config')
-            dev = os.path.join(application_path, '../dist')
-            return prod if os.path.exists(prod) else dev
-        else:
-            return os.path.join(os.path.dirname(__file__))
-
-    def _load_inner_rules(self):
-        self.rule_base = os.path.join(self.getappdir(), 'inner_rules/{}.js'.format(self.conftype))
-        self.rules = self.load_rules(self.rule_base)
-
-    def load_rules(self, fname):
-        with open(os.path.realpath(fname), 'r') as f:
-            ret = json.load(f)
-        return ret
+        self.ruleset = RuleSet.get(self.conftype, options)
+        self.rules = self.ruleset.rules
+        self.parse_cache = ParseCache.get(options)
+        self.queries = self.ruleset.queries
+        self.prefiltered = self._prefilter(options.prefilter_size) if options.prefilter_size else False
+        self.found = {} if options.query_memo else None
 
-    def _get_user_rules(self, l):
-        ret = []
-        for rule in l:
-            if rule['conftype'] == self.conftype:
-                ret.append(rule)
-        return ret
+    def _prefilter(self, limit):
+        """
+        Drop the queries of options whose names do not occur in the raw text of the file
+
+        Rules of the dropped queries have nothing to match, whatever the parser would build. Files
+        larger than the limit and files with NUL bytes (UTF-16 and alike) are not searched.
+
+        @type  limit: int
+        @param limit: size of the largest file to search
+
+        @rtype: bool
+        @return: whether the queries were filtered
+        """
+        source = SourceFile.open(self.source)
+        if source.size > limit or source.data.find(b'\x00') >= 0:
+            return False
+        key = (type(self), self.ruleset.digest)
+        prefilter = self._prefilters.get(key)
+        if prefilter is None:
+            words = [name.lstrip('@') for name in self.ruleset.queries] + list(self.prefilter_words)
+            prefilter = self._prefilters[key] = Prefilter(words)
+        found = prefilter.search(source.data[:limit])
+        if found.intersection(self.prefilter_words):
+            return False
+        self.queries = {name: contexts for name, contexts in self.ruleset.queries.items()
+                        if name.lstrip('@').lower() in found}
+        return True
+
+    def parse_cached(self, parse, dependencies=None, *key):
+        """
+        Parse the configuration file, or load the result of a previous parse from the parse cache
+
+        @type  parse: function
+        @param parse: parses the configuration file; its result must be picklable
+        @type  dependencies: function
+        @param dependencies: returns files the parse result was read from, besides the configuration file;
+                             relative includes are resolved from the directory of the file, so it is
+                             part of the cache key
+        @type  key: tuple
+        @param key: anything else the parse result depends on
+
+        @rtype: object
+        """
+        if self.parse_cache is None:
+            return parse()
+        key = (type(self).__name__, self.parser_version) + key
+        if dependencies is not None:
+            key += (os.path.dirname(os.path.realpath(self.source)),)
+        return self.parse_cache.load(self.source, key, parse, dependencies)
+
+    def dependencies(self):
+        """
+        Return files (and directories searched for them) the parsed configuration was read from,
+        besides the configuration file itself
+
+        @rtype: list
+        """
+        return []
+
+    @classmethod
+    def resolve(cls, fname):
+        """
+        Pick the configuration class of the file before it is parsed
+
+        Classes mapped to file names used by several products override this and look at the beginning
+        of the file only.
+
+        @rtype: class
+        @return: the class itself or one of its subclasses
+        """
+        return cls
+
+    @staticmethod
+    def by_conftype(conftype):
+        """
+        Return the configuration class of a configuration type
+
+        @rtype: class or None
+        """
+        classes = [Config]
+        while classes:
+            cls = classes.pop()
+            if cls.conftype == conftype:
+                return cls
+            classes.extend(cls.__subclasses__())
+        return None
+
+    @classmethod
+    def rules_digest(cls, options):
+        """
+        Return the digest of the rules files of the configuration class are matched against
+
+        @rtype: string
+        """
+        return RuleSet.get(cls.conftype, options).digest
+
+    @classmethod
+    def scan_finished(cls):
+        """
+        Release what was kept for the duration of a scan
+        """
+        pass
 
     def get_extended_context(self, context, extlist):
         pass
@@ -45,6 +132,119 @@ class Config:
     def find_nodes(self, name, context=None):
         pass
 
+    def query(self, name, context=None):
+        """
+        Find the nodes of an option, searching the parsed configuration once per option name and context
+
+        Results are kept until release is called; the matched nodes must not be changed.
+
+        @type  name: string
+        @param name: option name
+        @type  context: list, tuple or string
+        @param context: contexts of the option
+
+        @rtype: list
+        @return: matched nodes
+        """
+        return self._memo((name, self._context_key(context)), self.find_nodes, name, context)
+
+    def join(self, name, context, option):
+        """
+        join_nodes kept like the results of query
+
+        @rtype: dict or None
+        """
+        return self._memo((name, self._context_key(context), option), self.join_nodes, name, context, option)
+
+    def _memo(self, key, find, *args):
+        if self.found is None:
+            return find(*args)
+        try:
+            return self.found[key]
+        except KeyError:
+            ret = self.found[key] = find(*args)
+            return ret
+
+    @staticmethod
+    def _context_key(context):
+        return tuple(context) if isinstance(context, list) else context
+
+    def source_line(self, fname, lineno):
+        """
+        Return a line of the configuration file or of a file it includes
+
+        Lines are read from the contents the file was parsed from.
+
+        @type  fname: string
+        @param fname: file name
+        @type  lineno: int
+        @param lineno: line number, starting at 1
+
+        @rtype: string
+        @return: stripped line
+        """
+        return SourceFile.open(fname).line(lineno).strip()
+
+    def release(self):
+        """
+        Forget the nodes found by query once the configuration is scanned
+        """
+        if self.found is not None:
+            self.found.clear()
+
+    def collect_nodes(self, queries):
+        """
+        Find the nodes of all rules at once
+
+        Subclasses traverse the parsed configuration once and route every option to the queries of
+        its name; this default runs query for every query.
+
+        @type  queries: dict
+        @param queries: option name -> list of contexts
+
+        @rtype: dict
+        @return: (option name, context) -> list of matched nodes
+        """
+        return {(name, context): self.query(name, context)
+                for name, contexts in queries.items() for context in contexts}
+
+    def join_nodes(self, name, context, option):
+        """
+        Find the nodes of an option in every context element at once, grouped by the value of another
+        option of the same element
+
+        Composite rules look the option up once per value of their leading option, in the context
+        extended with [option="value"]; the groups returned here replace these lookups.
+
+        @type  name: string
+        @param name: option name
+        @type  context: list
+        @param context: contexts of the option
+        @type  option: string
+        @param option: name of the leading option
+
+        @rtype: dict or None
+        @return: leading option value -> list of matched nodes, or None if the configuration type
+                 cannot group nodes
+        """
+        return None
+
+    def _join_contexts(self, queries, found):
+        """
+        Build collect_nodes result from nodes found per single context
+
+        @type  found: dict
+        @param found: (option name, single context) -> list of matched nodes
+        """
+        ret = {}
+        for name, contexts in queries.items():
+            for context in contexts:
+                nodes = []
+                for c in context:
+                    nodes.extend(found.get((name, c), []))
+                ret[(name, context)] = nodes
+        return ret
+
     def is_unique_option(self, option):
         return False if option in self.not_unique else True
 
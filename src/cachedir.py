@@ -0,0 +1,107 @@
+import os
+import socket
+import zlib
+
+
+class CacheDir:
+    """
+    Directory of cache entries with a size limit
+
+    Entries are written atomically, so the directory can be shared by concurrent scans. The least
+    recently used entries are removed when the directory grows over the size limit.
+    """
+    suffix = ''
+    _opened = {}
+
+    def __init__(self, path, max_size, log):
+        self.path = path
+        self.max_size = max_size
+        self.log = log
+        os.makedirs(path, exist_ok=True)
+        self.size = sum(size for _, size, _ in self._entries())
+
+    @classmethod
+    def _open(cls, path, max_size, log):
+        key = (cls, path, max_size)
+        try:
+            return cls._opened[key]
+        except KeyError:
+            cache = cls._opened[key] = cls(path, max_size, log)
+            return cache
+
+    def entry(self, digest, key):
+        """
+        Return the entry file name of a content hash and whatever else the cached data depends on
+
+        @type  digest: string
+        @param digest: content hash of the configuration file
+        @type  key: tuple
+        @param key: JSON serializable values
+
+        @rtype: string
+        """
+        name = '{}-{:08x}{}'.format(digest, zlib.crc32(repr(key).encode()), self.suffix)
+        return os.path.join(self.path, name)
+
+    def read(self, entry):
+        """
+        Return the content of the entry and mark it as recently used
+
+        @rtype: bytes
+        @return: entry content, or None if there is no such entry
+        """
+        try:
+            with open(entry, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.log.write("Cache entry {} is ignored: {}".format(entry, e))
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return data
+
+    def write(self, entry, data):
+        tmp = '{}.{}.{}.tmp'.format(entry, socket.gethostname(), os.getpid())
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, entry)
+        except OSError as e:
+            self.log.write("Cache entry {} is not written: {}".format(entry, e))
+            return
+        self.size += len(data)
+        if self.size > self.max_size:
+            self._evict()
+
+    def _entries(self):
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(self.suffix):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self.size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    @staticmethod
+    def stat(fname):
+        try:
+            st = os.stat(fname)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from contextlib import redirect_stderr
+from log import Log
+from options import parser
+from httpgen import SocketTransport
+from utils import check_disk_free_space
+
+
+class ScanHandler(socketserver.StreamRequestHandler):
+    """
+    Scan jobs of one client connection
+
+    Every request is a JSON line {"path": ..., "args": [...]}, args being command line options of a scan.
+    Every finding is answered with a line {"vuln": {...}} carrying the BadOption/MissingOption fields, and
+    the job is closed with {"done": {...}} or {"error": ...}. Clients idle for longer than the
+    --daemon-timeout of the daemon are disconnected, so that they do not hold up the next ones.
+    """
+    def setup(self):
+        self.timeout = self.server.options.daemon_timeout
+        socketserver.StreamRequestHandler.setup(self)
+
+    def handle(self):
+        try:
+            self.serve_jobs()
+        except socket.timeout:
+            self.server.log.write("Daemon client idle for {} s is disconnected".format(self.timeout))
+
+    def serve_jobs(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            errors = io.StringIO()
+            try:
+                job = json.loads(line.decode('utf-8'))
+                with redirect_stderr(errors):
+                    options, _ = parser.parse_args(list(job.get('args', [])))
+                path = job['path']
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                self.reply({'error': 'Bad request: {}'.format(e)})
+                continue
+            except SystemExit:
+                self.reply({'error': 'Bad request: {}'.format(errors.getvalue().strip().splitlines()[-1])})
+                continue
+            options.json_version = self.server.options.json_version
+            transporter = SocketTransport(options, self.wfile)
+            start = time.time()
+            try:
+                self.server.analyzer(options, transporter=transporter).scandir(path)
+            except Exception as e:
+                self.server.log.write("%s" % e)
+                self.server.log.exc()
+                transporter.write({'error': "%s" % e})
+                continue
+            finally:
+                transporter.stop()
+            transporter.write({'done': {'path': path, 'findings': transporter.nexploit,
+                                        'elapsed': round(time.time() - start, 6)}})
+            if transporter.closed:
+                return
+
+    def reply(self, message):
+        self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+
+
+# Unix domain sockets are missing on Windows, where serve refuses to run
+if hasattr(socket, 'AF_UNIX'):
+    class ScanDaemon(socketserver.UnixStreamServer):
+        """
+        Scanner serving jobs on a Unix domain socket
+
+        Jobs are run one at a time in this process, so compiled rule sets and parser tables stay warm
+        between them.
+        """
+        def __init__(self, address, options, analyzer):
+            self.options = options
+            self.analyzer = analyzer
+            self.log = Log(options.logs_dir)
+            if os.path.exists(address):
+                os.remove(address)
+            socketserver.UnixStreamServer.__init__(self, address, ScanHandler)
+
+        def server_close(self):
+            socketserver.UnixStreamServer.server_close(self)
+            if os.path.exists(self.server_address):
+                os.remove(self.server_address)
+
+
+def serve(options, analyzer):
+    """
+    Serve scan jobs until interrupted
+
+    @type  analyzer: class
+    @param analyzer: ConfigAnalyzer
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise SystemExit("<error>Unix domain sockets are not supported on this platform</error>")
+    check_disk_free_space(Log(options.logs_dir).HOMEDIR)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with ScanDaemon(options.daemon, options, analyzer) as server:
+        server.log.write("Serving scan jobs on {}".format(options.daemon))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
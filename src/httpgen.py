@@ -1,5 +1,8 @@
+import gzip
 import hashlib
-from xml.dom.minidom import Document, Attr
+import json
+import pathlib
+from xml.dom.minidom import Attr
 
 import log
 from utils import *
@@ -17,7 +20,7 @@ class TransportManager:
             self.pipe = None
         if self.pipe:
             self.pipe.json_version = options.json_version
-        self.reportMgr = ReportManager(self.options.report)
+        self.reportMgr = ReportManager.get(self.options)
         self.nexploit = 0
 
     def stop(self):
@@ -65,51 +68,173 @@ class TransportManager:
         return ret
 
 
+class SocketTransport(TransportManager):
+    """
+    Transport of a daemon scan job: findings are streamed to the client as JSON lines
+    """
+    def __init__(self, options, wfile):
+        self.options = options
+        self.log = log.Log(options.logs_dir)
+        self.pipe = None
+        self.reportMgr = ReportManager.get(self.options)
+        self.nexploit = 0
+        self.wfile = wfile
+        self.closed = False
+
+    def send(self, vuln):
+        vuln.place = self._exploit_id(vuln)
+        self._send_vuln(vuln)
+        self.reportMgr.add_vuln(vuln)
+
+    def _send_vuln(self, vulner):
+        self.write({'vuln': vulner.dump()})
+
+    def write(self, message):
+        if self.closed:
+            return
+        try:
+            self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+            self.wfile.flush()
+        except OSError as e:
+            self.log.write("Daemon client is gone: {}".format(e))
+            self.closed = True
+
+
+def xml_text(value):
+    """
+    Escape text of an element, as minidom does
+    """
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def xml_cdata(value):
+    """
+    Wrap text in a CDATA section, splitting it where the text contains the end of the section
+    """
+    return '<![CDATA[%s]]>' % value.replace(']]>', ']]]]><![CDATA[>')
+
+
 class ReportManager:
+    """
+    XML report written while the scan runs
+
+    The report is kept open for the whole scan: the header is written when the report is created,
+    every finding is appended as it is found and stop closes the root element. Findings are laid out
+    like minidom's toprettyxml.
+    """
+    HEADER = '<?xml version="1.1" encoding="UTF-8" ?>\n<report>\n'
+    FOOTER = '\n</report>\n'
+
     def __init__(self, repname):
         self.report = repname
+        self.f = None
         if self.report:
-            write_file(self.report, '')
+            self.f = self._open(self.report)
             check_disk_free_space(os.path.realpath(self.report))
+            self.f.write(self.HEADER)
+
+    @classmethod
+    def get(cls, options):
+        """
+        Create the report in the format chosen by the options
+
+        @rtype: ReportManager
+        """
+        formats = {'xml': ReportManager, 'jsonl': JsonLinesReport, 'sarif': SarifReport}
+        return formats[options.report_format](options.report)
+
+    @staticmethod
+    def _open(fname):
+        if fname.endswith('.gz'):
+            return gzip.open(fname, 'wt', encoding='utf-8')
+        return open(fname, 'w', encoding='utf-8')
 
     def stop(self):
-        if self.report:
-            write_file(self.report, '<?xml version="1.1" encoding="UTF-8" ?>\n<report>\n%s\n</report>\n'
-                       % open(self.report, 'r', encoding='utf-8').read())
+        if self.f:
+            self.f.write(self.FOOTER)
+            self.f.close()
+            self.f = None
 
     def add_vuln(self, vuln):
-        if self.report:
-            vulnstr = self.build_xml_str(vuln)
-            append_file(self.report, vulnstr + '\n')
+        if self.f:
+            self.f.write(self.format(vuln))
+
+    def format(self, vuln):
+        """
+        @rtype: string
+        @return: the finding as written to the report
+        """
+        return self.build_xml_str(vuln) + '\n'
 
     def build_xml_str(self, vulner):
-        doc = Document()
-        vuln = doc.createElement('vuln')
-        doc.appendChild(vuln)
-        self._add_pair(doc, vuln, 'entry', vulner.entry)
-        self._add_pair(doc, vuln, 'type', vulner.type)
-        self._add_pair(doc, vuln, 'function', vulner.option)
-        self._add_pair(doc, vuln, 'existing_value', vulner.existing_value)
-        self._add_pair(doc, vuln, 'recommended_value', vulner.recommended_value)
-        self._add_pair(doc, vuln, 'file', vulner.file)
         vulner.lineno = str(vulner.lineno)
-        self._add_pair(doc, vuln, 'lineno', vulner.lineno)
         line = vulner.line if not isinstance(vulner.line, Attr) else vulner.line.value
-        self._add_pair(doc, vuln, 'line', line, cdata=True)
-        self._add_pair(doc, vuln, 'place', vulner.place)
-        self._add_pair(doc, vuln, 'exploit', vulner.exploit)
-
-        vulnstr = vuln.toprettyxml(indent='  ')
-        return vulnstr
-
-    def _add_pair(self, doc, parent, name, value, cdata=False):
-        name = doc.createElement(name)
-        parent.appendChild(name)
-        if cdata:
-            value = doc.createCDATASection(value)
+        fields = [('entry', xml_text(vulner.entry)),
+                  ('type', xml_text(vulner.type)),
+                  ('function', xml_text(vulner.option)),
+                  ('existing_value', xml_text(vulner.existing_value)),
+                  ('recommended_value', xml_text(vulner.recommended_value)),
+                  ('file', xml_text(vulner.file)),
+                  ('lineno', xml_text(vulner.lineno)),
+                  ('line', xml_cdata(line)),
+                  ('place', xml_text(vulner.place)),
+                  ('exploit', xml_text(vulner.exploit))]
+        return '<vuln>\n%s</vuln>\n' % ''.join('  <%s>%s</%s>\n' % (name, value, name) for name, value in fields)
+
+
+class JsonLinesReport(ReportManager):
+    """
+    Report of a JSON object per line, with the fields of the finding as Vuln.dump returns them
+    """
+    HEADER = ''
+    FOOTER = ''
+
+    def format(self, vuln):
+        return json.dumps(vuln.dump()) + '\n'
+
+
+class SarifReport(ReportManager):
+    """
+    SARIF 2.1.0 log of a single run
+
+    Results are written as findings come; stop closes the results array and the log. Fields of the
+    finding are kept in the properties of its result.
+    """
+    HEADER = ('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", '
+              '"runs": [{"tool": {"driver": {"name": "PT.Config", '
+              '"informationUri": "https://github.com/PositiveTechnologies/PT.Config"}}, "results": [\n')
+    FOOTER = '\n]}]}\n'
+
+    def __init__(self, repname):
+        ReportManager.__init__(self, repname)
+        self.separator = ''
+
+    def format(self, vuln):
+        ret = self.separator + json.dumps(self.build_result(vuln))
+        self.separator = ',\n'
+        return ret
+
+    @staticmethod
+    def build_result(vuln):
+        if isinstance(vuln, MissingOption):
+            text = '{} is not set, recommended value: {}'.format(vuln.option, vuln.recommended_value)
         else:
-            value = doc.createTextNode(value)
-        name.appendChild(value)
+            text = '{} is {}, recommended value: {}'.format(vuln.option, vuln.existing_value,
+                                                            vuln.recommended_value)
+        location = {'artifactLocation': {'uri': file_uri(vuln.file)}}
+        if int(vuln.lineno) > 0:
+            location['region'] = {'startLine': int(vuln.lineno), 'snippet': {'text': vuln.line}}
+        return {'ruleId': vuln.type, 'level': 'warning', 'message': {'text': text},
+                'locations': [{'physicalLocation': location}], 'properties': vuln.dump()}
+
+
+def file_uri(fname):
+    """
+    @rtype: string
+    @return: file URI of an absolute path, or the path with forward slashes
+    """
+    path = pathlib.Path(fname)
+    return path.as_uri() if path.is_absolute() else path.as_posix()
 
 
 class FileExtensions:
@@ -118,7 +243,25 @@ class FileExtensions:
         self.extensions = ['conf', 'htaccess', 'config', 'xml', 'ini']
 
 
+def load_vuln(fields):
+    """
+    Restore a vulnerability saved with Vuln.dump
+    """
+    cls = MissingOption if fields['kind'] == 'MissingOption' else BadOption
+    vuln = cls.__new__(cls)
+    vuln.__dict__.update((k, v) for k, v in fields.items() if k != 'kind')
+    return vuln
+
+
 class Vuln:
+    def dump(self):
+        """
+        Return the vulnerability fields as a JSON serializable dict
+        """
+        ret = dict(self.__dict__)
+        ret['kind'] = self.__class__.__name__
+        return ret
+
     def __repr__(self):
         return """{}\nentry: {}\nfile: {}\noption: {}\ncurrent value: {}\nlineno: {}\nline: {}\nrecommended_value: {}\n{}""".format(
                 "=" * 80, self.entry, self.file, self.option, self.existing_value, self.lineno, self.line,
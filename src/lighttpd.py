@@ -1,16 +1,24 @@
 # coding=utf8
 import os
 from baseconfig import Config, MatchingNode
+from sourcefile import SourceFile
+from values import typed
 
 
 class Lighttpd(Config):
     conftype = 'lighttpd.conf'
+    prefilter_words = ('include',)
+    parser_version = 3
 
     def __init__(self, path, options):
         Config.__init__(self, path, options)
-        with open(path, 'r') as f:
-            self.config = LighttpdParser(f.read()).parse()
-            self._visit()
+        self.config, self.includes = self.parse_cached(self._parse, lambda parsed: parsed[1])
+
+    def _parse(self):
+        self.includes = []
+        self.config = LighttpdParser(SourceFile.open(self.source).text()).parse()
+        self._visit()
+        return self.config, self.includes
 
     def get_opt_offset(self, opt, offset):
         if not isinstance(opt, Array):
@@ -32,14 +40,16 @@ class Lighttpd(Config):
                 fname = os.path.realpath(os.path.join(os.path.dirname(self.source), opt.fname))
             else:
                 fname = opt.fname
-            with open(fname, 'r') as f:
-                data = f.read()
-            child_config = LighttpdParser(data).parse()
+            self.includes.append(fname)
+            child_config = LighttpdParser(SourceFile.open(fname).text()).parse()
             self._set_sourcename(child_config, fname)
             return self.config.extend(child_config)
         except OSError:
             print("include path in lineno {} does not exist".format(opt.lineno))
 
+    def dependencies(self):
+        return self.includes
+
     def _set_sourcename(self, config, fname):
         for stmt in config:
             stmt.source = fname
@@ -54,6 +64,25 @@ class Lighttpd(Config):
             ret.extend(self._find(opt, name))
         return ret
 
+    def collect_nodes(self, queries):
+        ret = {(name, context): [] for name, contexts in queries.items() for context in contexts}
+        for opt in self.config:
+            for node in self._iter_nodes(opt):
+                for context in queries.get(node.name, []):
+                    if (context == 'root' and isinstance(opt, If)) or (context == 'if' and not isinstance(opt, If)):
+                        continue
+                    ret[(node.name, context)].append(node)
+        return ret
+
+    def _iter_nodes(self, container):
+        source = None if not hasattr(container, 'source') else container.source
+
+        if isinstance(container, (Assignment, Concat)):
+            yield MatchingNode(container.left.name, container.right, container.lineno, source=source)
+        elif isinstance(container, If):
+            for opt in container.stmts:
+                yield from self._iter_nodes(opt)
+
     def _find(self, container, name):
         source = None if not hasattr(container, 'source') else container.source
 
@@ -85,6 +114,9 @@ class LighttpdParser:
 class LighttpdLexer:
     def __init__(self, data):
         self.lexer = lexer
+        # the lexer is shared by the files parsed in the process
+        self.lexer.lineno = 1
+        self.lexer.begin('INITIAL')
         self.lexer.input(data)
 
     def next_token(self):
@@ -237,7 +269,7 @@ def p_value(p):
              | option_name
              | value PLUS value'''
     if len(p) == 2:
-        p[0] = p[1]
+        p[0] = typed(p[1])
     else:
         p[0] = Concat(p[1], p[3], lineno=p.lineno(1))
 
@@ -0,0 +1,53 @@
+import re
+from array import array
+from itertools import accumulate
+
+NEWLINE = re.compile(rb'\r\n?|\n')
+
+
+class LineIndex:
+    """
+    Offsets of the lines of a file, for reading single lines without decoding the whole file
+
+    Lines end with \n, \r\n or \r, as in files opened in text mode. Offsets are computed on the first
+    lookup.
+    """
+    def __init__(self, data, encoding='utf-8'):
+        self.data = data
+        self.encoding = encoding
+        self.offsets = None
+
+    def line(self, lineno):
+        """
+        Return a line of the file
+
+        Lines that cannot be decoded have their bad bytes replaced.
+
+        @type  lineno: int
+        @param lineno: line number, starting at 1
+
+        @rtype: string
+        @return: line with its end, or an empty string if there is no such line
+        """
+        if self.offsets is None:
+            self.offsets = self._index()
+        if not 1 <= lineno < len(self.offsets):
+            return ''
+        raw = self.data[self.offsets[lineno - 1]:self.offsets[lineno]]
+        try:
+            return raw.decode(self.encoding)
+        except UnicodeDecodeError:
+            return raw.decode(self.encoding, 'replace')
+
+    def _index(self):
+        """
+        @rtype: array
+        @return: offsets of the line starts, followed by the size of the file
+        """
+        if isinstance(self.data, bytes):
+            return array('q', accumulate(map(len, self.data.splitlines(True)), initial=0))
+        offsets = array('q', [0])
+        offsets.extend(m.end() for m in NEWLINE.finditer(self.data))
+        if offsets[-1] < len(self.data):
+            offsets.append(len(self.data))
+        return offsets
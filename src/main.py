@@ -1,16 +1,21 @@
-import re
 import sys
 import os
+import time
+import multiprocessing
 from json import JSONDecodeError
 from log import Log
 from options import options, args
 from utils import *
 from configs import *
 from httpgen import TransportManager, MissingOption, BadOption
+from resultcache import ResultCache
+from sourcefile import SourceFile
+from state import ScanState
+from walker import Walker
 
 
 class ConfigAnalyzer:
-    def __init__(self, options):
+    def __init__(self, options, worker=False, transporter=None):
         self.fmapping = {
             'apache.conf': Apache,
             'apache2.conf': Apache,
@@ -29,9 +34,15 @@ class ConfigAnalyzer:
         }
         self.log = Log(options.logs_dir)
         self.matcher = Matcher(self.log)
-        check_disk_free_space(self.log.HOMEDIR)
         self.options = options
-        self.transporter = TransportManager(self.options)
+        self.results = ResultCache.get(options)
+        if worker:
+            return
+        if transporter is None:
+            check_disk_free_space(self.log.HOMEDIR)
+            transporter = TransportManager(self.options)
+        self.transporter = transporter
+        self.state = ScanState(options.state_file, options, self.log) if options.state_file else None
 
     def preprocessing(self):
         self.transporter.sendPriorities()
@@ -39,22 +50,117 @@ class ConfigAnalyzer:
     def scandir(self, path):
         self.log.write('sys.argv=%s' % repr(sys.argv))
         if os.path.isdir(path):
-            for top, dirs, files in os.walk(path):
-                for nm in files:
-                    self._scanfile(os.path.join(top, nm))
+            files = Walker(self.fmapping, self.options, self.log).walk(path)
         elif os.path.isfile(path):
-            self._scanfile(path)
+            files = Walker(self.fmapping, self.options, self.log).file(path)
         else:
             self.log.write("Scan target {} does not exist".format(path))
+            files = []
+        if self.options.jobs > 1:
+            self._scan_parallel(files)
+        else:
+            for fname in files:
+                self._scanfile(fname)
+        for cls in set(self.fmapping.values()):
+            cls.scan_finished()
+        if self.state:
+            self.state.save(path)
         self.transporter.stop()
 
+    def _scan_parallel(self, files):
+        """
+        Parse and match files in a pool of worker processes
+
+        Findings are sent from this process only, in the same order as a serial scan would send them.
+
+        @type  files: iterable
+        @param files: file names in walk order
+        """
+        files = list(files)
+        cached = {}
+        for fname in files:
+            vulns = self.state.lookup(fname) if self.state else None
+            if vulns is not None:
+                cached[fname] = vulns
+        targets = [f for f in files if f not in cached]
+        chunksize = max(1, min(16, len(targets) // (self.options.jobs * 4)))
+        workers = {}
+        with multiprocessing.Pool(self.options.jobs, _init_worker, (self.options,)) as pool:
+            results = pool.imap(_scan_worker, targets, chunksize)
+            for fname in files:
+                try:
+                    self.transporter.startFile()
+                    if fname in cached:
+                        self.log.write("Unchanged: %s" % fname)
+                        self.alert(cached[fname])
+                    else:
+                        vulns, meta, pid, elapsed = next(results)
+                        stat = workers.setdefault(pid, [0, 0.0])
+                        stat[0] += 1
+                        stat[1] += elapsed
+                        if self.state and meta:
+                            self.state.record(fname, meta, vulns)
+                        self.alert(vulns)
+                except Exception as e:
+                    self.log.write("%s" % e)
+                    self.log.exc()
+                finally:
+                    self.transporter.stopFile()
+        for pid, (nfiles, elapsed) in sorted(workers.items()):
+            self.log.write("Worker {}: {} files in {:.3f}s".format(pid, nfiles, elapsed))
+
     def _scanfile(self, fname):
         try:
             self.transporter.startFile()
+            vulns = self.state.lookup(fname) if self.state else None
+            if vulns is not None:
+                self.log.write("Unchanged: %s" % fname)
+            else:
+                vulns, meta = self.checkfile(fname, describe=self.state is not None)
+                if meta:
+                    self.state.record(fname, meta, vulns)
+            self.alert(vulns)
+        except Exception as e:
+            self.log.write("%s" % e)
+            self.log.exc()
+        finally:
+            self.transporter.stopFile()
+
+    def checkfile(self, fname, describe=False):
+        """
+        Parse the file and match it against the rules of its configuration type
+
+        @type  fname: string
+        @param fname: file name
+        @type  describe: bool
+        @param describe: describe the scanned file for the scan state
+
+        @rtype: tuple
+        @return: found vulnerabilities and the scan state entry of the file (None if the file
+                 was not scanned completely or describe is False)
+        """
+        vulns, meta = [], None
+        try:
             basename = os.path.basename(fname)
-            config = self.fmapping[basename.lower()](fname, self.options)
-            self.log.write("Processing: %s" % config.source)
-            self._scan(config)
+            cls = self.fmapping[basename.lower()].resolve(fname)
+            snapshot = ScanState.snapshot(fname) if describe or self.results else None
+            cached = self.results.lookup(cls, fname, snapshot, self.options) if self.results else None
+            if cached is not None:
+                self.log.write("Cached: %s" % fname)
+                vulns, described = cached
+            else:
+                config = cls(fname, self.options)
+                self.log.write("Processing: %s" % config.source)
+                try:
+                    for vuln in self._scan(config):
+                        vulns.append(vuln)
+                finally:
+                    config.release()
+                described = ScanState.describe(config, snapshot) if snapshot else None
+                if self.results:
+                    self.results.store(cls, fname, described, vulns, self.options)
+            if describe:
+                meta = described
         except KeyError:
             pass
         except OSError as e:
@@ -65,39 +171,77 @@ class ConfigAnalyzer:
             self.log.write("%s" % e)
             self.log.exc()
         finally:
-            self.transporter.stopFile()
+            SourceFile.release()
+        return vulns, meta
 
     def _scan(self, config):
+        nodes = config.collect_nodes(config.queries)
         for rule in config.rules:
-            if isinstance(rule, list):
-                self._apply_composite_rule(config, rule)
+            if isinstance(rule, tuple):
+                yield from self._apply_composite_rule(config, rule, nodes)
             else:
-                ret = self.matcher.match(config, Rule(rule))
-                if ret:
-                    self.alert(ret)
+                yield from self.matcher.match(config, rule, suspects=nodes.get(rule.query(), []))
 
-    def _apply_composite_rule(self, config, rules):
-        rules = [Rule(r) for r in rules]
+    def _apply_composite_rule(self, config, rules, nodes):
+        rules = list(rules)
         xpaths = []
         [xpaths.extend(r.xpath()) for r in rules]
         names = [r.name() for r in rules]
         unique_xpaths, unique_names = set(xpaths), set(names)
         if len(unique_xpaths) == 1 and len(unique_names) > 1:
-            suspects = self.matcher.match(config, rules.pop(0))
+            lead = rules.pop(0)
+            suspects = self.matcher.match(config, lead, suspects=nodes.get(lead.query(), []))
+            joined = self._join(config, lead, rules, suspects)
             for suspect in suspects:
-                ret = [self.matcher.match(config, r, extended_context=config.get_extended_context(r.xpath(),
-                                                        [(suspect.option, suspect.existing_value)])) for r in rules]
+                context = [(suspect.option, suspect.existing_value)]
+                if joined is None:
+                    ret = [self.matcher.match(config, r, extended_context=config.get_extended_context(r.xpath(),
+                                                            context)) for r in rules]
+                else:
+                    ret = [self.matcher.match(config, r, extended_context=config.get_extended_context(r.xpath(),
+                                                            context), suspects=j.get(suspect.existing_value, []))
+                           for r, j in zip(rules, joined)]
                 if all(ret):
-                    self.alert(ret[-1])
+                    yield from ret[-1]
         else:
-            ret = [self.matcher.match(config, r) for r in rules]
+            ret = [self.matcher.match(config, r, suspects=nodes.get(r.query(), [])) for r in rules]
             if all(ret):
-                self.alert(ret[-1])
+                yield from ret[-1]
+
+    def _join(self, config, lead, rules, suspects):
+        """
+        Find the nodes of the rules following the leading rule of a composite rule, grouped by the value
+        of the leading option, instead of searching them again for every leading node
+
+        @rtype: list or None
+        @return: leading option value -> list of nodes, per rule; None if the nodes have to be searched
+                 per leading node
+        """
+        if not suspects:
+            return None
+        joined = {}
+        for r in rules:
+            if r.query() not in joined:
+                joined[r.query()] = config.join(r.name(), r.xpath(), lead.name())
+                if joined[r.query()] is None:
+                    return None
+        return [joined[r.query()] for r in rules]
 
     def alert(self, vulnlist):
         [self.transporter.send(vuln) for vuln in vulnlist]
 
 
+def _init_worker(options):
+    global _worker
+    _worker = ConfigAnalyzer(options, worker=True)
+
+
+def _scan_worker(fname):
+    start = time.time()
+    vulns, meta = _worker.checkfile(fname, describe=bool(_worker.options.state_file))
+    return vulns, meta, os.getpid(), time.time() - start
+
+
 class Matcher:
     OK = 0
     SKIP = 1
@@ -105,9 +249,11 @@ class Matcher:
 
     def __init__(self, log):
         self.log = log
+        self.missing = {}
 
-    def match(self, config, rule, extended_context=''):
-        suspects = config.find_nodes(rule.name(), context=extended_context if extended_context else rule.xpath())
+    def match(self, config, rule, extended_context='', suspects=None):
+        if suspects is None:
+            suspects = config.query(rule.name(), context=extended_context if extended_context else rule.xpath())
         unique_option = config.is_unique_option(rule.name())
         found = True if unique_option else False
 
@@ -120,7 +266,7 @@ class Matcher:
                                  exitpoint=exitpoint,
                                  type=rule.id(), option=rule.name(), existing=suspect.value,
                                  rec=rule.recommended_value(), lineno=suspect.lineno,
-                                 line=file_line(exitpoint, suspect.lineno))
+                                 line=config.source_line(exitpoint, suspect.lineno))
                 vl.append(vuln)
             elif ret == self.SKIP:
                 continue
@@ -128,179 +274,58 @@ class Matcher:
                 found = True
 
         if not suspects or not found:
-            ret = self.compare(rule.default_value(), rule, is_unique=unique_option)
-            if ret != self.OK:
-                return [MissingOption(entrypoint=config.source, exitpoint=config.source,
-                                      type=rule.id(), option=rule.name(), rec=rule.recommended_value(),
-                                      line=config.fill_missing_line(rule.name(), rule.recommended_value(),
-                                                                    extended_context if extended_context else rule.xpath()))]
+            missing = self._missing(config, rule, extended_context)
+            if missing is not None:
+                return [missing]
 
         return vl
 
-    def compare(self, existing, rule, is_unique=True):
-        nr = rule.not_recommended_values()
-        op = rule.comparison_type()
-        cm = rule.comparison_method()
-        regexp = rule.regexp()
-
-        if nr:
-            rets = [self.do_op(v, existing, op) for v in nr]
-            if eval("{}({})".format(cm, rets)):
-                return self.ALERT
-            return self.OK
-        r = rule.recommended_values()
-        values = regexp if regexp else r
-        rets = [self.do_op(v, existing, op) for v in values]
-        if eval("{}({})".format(cm, rets)):
-            return self.OK
-        return self.ALERT if is_unique else self.SKIP
-
-    def do_op(self, left, right, op):
-        if isinstance(left, dict):
-            return self.do_op_array(left, right, op)
-        return self.do_op_simple(left, right, op)
-
-    def do_op_array(self, left, right, op):
-        if not hasattr(right, 'offset'):
-            return False
-        if op == 'equal':
-            if len(right.items) != len(left):
-                return False
-            for key, value in left.items():
-                if right.offset(key) == value:
-                    continue
-                return False
-            return True
-        elif op == 'in':
-            for key, value in left.items():
-                if right.offset(key) == value:
-                    continue
-                return False
-            return True
-        elif op in ['<=', '>=', 'regexp']:
-            for key, value in left.items():
-                if self.do_op_simple(value, right.offset(key), op):
-                    continue
-                return False
-            return True
-        else:
-            self.log.write("Unsupported comparison type {}".format(op))
-
-    def do_op_simple(self, left, right, op):
-        if op == 'equal':
-            return True if str(left).lower() == str(right).lower() else False
-        elif op == 'in':
-            return True if str(left) in str(right) else False
-        elif op in ['<=', '>=', '>', '<']:
-            factor = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
-            l = re.match("-?(\d+)(.*)", left)
-            r = re.match("-?(\d+)(.*)", right)
-            fl = l.group(2).lower()
-            fr = r.group(2).lower()
-            r = int(r.group(1))
-            l = int(l.group(1))
-            if fr:
-                try:
-                    r *= int(factor[fr])
-                except KeyError:
-                    pass
-            if fl:
-                try:
-                    l *= int(factor[fl])
-                except KeyError:
-                    pass
-
-            return eval("{}{}{}".format(r, op, l))
-        elif op == 'regexp':
-            pattern = re.compile(left)
-            return True if pattern.match(str(right)) else False
-        else:
-            self.log.write("Unsupported comparison type {}".format(op))
-
-
-class Rule:
-    def __init__(self, rule):
-        self.rule = rule
-        self.log = Log(options.logs_dir)
-
-    def name(self):
-        try:
-            ret = self.rule['name'].split('[')[0]
-            return ret
-        except KeyError:
-            self.log.write("Option name is missing in rule {}".format(self.rule))
-
-    def id(self):
-        try:
-            ret = self.type() + ' ' + self.rule['name']
-            return ret
-        except KeyError:
-            self.log.write("Option name is missing in rule {}".format(self.rule))
-
-    def xpath(self):
-        try:
-            ret = self.rule['xpath']
-            return [ret] if not isinstance(ret, list) else ret
-        except KeyError:
-            return ''
-
-    def comparison_type(self):
-        try:
-            return self.rule['comparison_type']
-        except KeyError:
-            return 'equal'
+    def _missing(self, config, rule, extended_context=''):
+        """
+        Report the option of the rule as missing, unless its default value is fine
 
-    def comparison_method(self):
-        try:
-            return self.rule['comparison_method']
-        except KeyError:
-            return 'any'
+        Without an extended context the report depends on the configuration class and the rule only,
+        so it is built once and copied for every file.
 
-    def default_value(self):
+        @rtype: MissingOption or None
+        """
+        if extended_context:
+            return self._build_missing(config, rule, extended_context)
+        key = (type(config), rule)
         try:
-            ret = self.rule['default']
-            return ret
+            template = self.missing[key]
         except KeyError:
-            self.log.write("Default value is missing in rule {}".format(self.rule))
+            template = self.missing[key] = self._build_missing(config, rule, rule.xpath())
+        if template is None:
+            return None
+        vuln = MissingOption.__new__(MissingOption)
+        vuln.__dict__.update(template.__dict__, entry=config.source, file=config.source)
+        return vuln
+
+    def _build_missing(self, config, rule, context):
+        ret = self.compare(rule.default_value(), rule, is_unique=config.is_unique_option(rule.name()))
+        if ret == self.OK:
+            return None
+        return MissingOption(entrypoint=config.source, exitpoint=config.source,
+                             type=rule.id(), option=rule.name(), rec=rule.recommended_value(),
+                             line=config.fill_missing_line(rule.name(), rule.recommended_value(), context))
 
-    def recommended_values(self):
-        try:
-            ret = self.rule['recommended']
-            return [ret] if not isinstance(ret, list) else ret
-        except KeyError:
-            self.log.write("Recommended value is missing in rule {}".format(self.rule))
-
-    def recommended_value(self):
-        if self.comparison_method() == 'all':
-            return ', '.join(self.recommended_values())
-        return self.recommended_values()[0]
-
-    def not_recommended_values(self):
-        try:
-            ret = self.rule['not_recommended']
-            return [ret] if not isinstance(ret, list) else ret
-        except KeyError:
-            return []
-
-    def regexp(self):
-        try:
-            ret = self.rule['regexp']
-            return [ret] if not isinstance(ret, list) else ret
-        except KeyError:
-            if self.comparison_type() == 'regexp':
-                self.log.write("Regular expression is missing in rule {}".format(self.rule))
-
-    def type(self):
-        try:
-            return self.rule['conftype']
-        except KeyError:
-            self.log.write("Config type is missing in rule {}".format(self.rule))
-            return ''
+    def compare(self, existing, rule, is_unique=True):
+        if rule.not_recommended_values():
+            return self.ALERT if rule.is_not_recommended(existing) else self.OK
+        if rule.is_recommended(existing):
+            return self.OK
+        return self.ALERT if is_unique else self.SKIP
 
 
 if __name__ == '__main__':
-    c = ConfigAnalyzer(options)
-    if options.preprocessing:
-        c.preprocessing()
+    multiprocessing.freeze_support()
+    if options.daemon:
+        from daemon import serve
+        serve(options, ConfigAnalyzer)
     else:
-        c.scandir(args[0])
+        c = ConfigAnalyzer(options)
+        if options.preprocessing:
+            c.preprocessing()
+        else:
+            c.scandir(args[0])
@@ -1,51 +1,69 @@
-import nginxparser
-from baseconfig import Config, MatchingNode
+import os
 import re
+import glob
+from baseconfig import Config, MatchingNode
+from sourcefile import SourceFile
+from values import typed
 
 
 class Nginx(Config):
     conftype = 'nginx.conf'
+    prefilter_words = ('include',)
+    parser_version = 4
 
     def __init__(self, path, options):
         Config.__init__(self, path, options)
-        with open(path, 'r') as f:
-            self.config = nginxparser.load(f)
-
-    def _setlineno(self, l):
-        i = 0
-        name, value = l[i].name, l[i].value
-        with open(self.source, "r") as searchfile:
-            for number, line in enumerate(searchfile):
-                if re.match(".*{}\s+{}.*".format(name, value), line):
-                    l[i].lineno = number+1
-                    i += 1
-                    if i == len(l):
-                        break
-                    name, value = l[i].name, l[i].value
-        return l
+        self.parser, self.config = self.parse_cached(self._parse, lambda parsed: parsed[0].includes)
+
+    def _parse(self):
+        parser = NginxParser()
+        return parser, parser.parse(self.source)
+
+    def dependencies(self):
+        return self.parser.includes
 
     def find_nodes(self, name, context=None):
         matched = []
         for c in context:
-            ret = self._find(self.config, name, self._containers_by_context(c))
-            if ret:
-                ret = self._setlineno(ret)
-            matched.extend(ret)
+            matched.extend(self._find(self.config, name, self._containers_by_context(c)))
         return matched
 
+    def collect_nodes(self, queries):
+        paths = {}
+        for name, contexts in queries.items():
+            for context in contexts:
+                for c in context:
+                    wanted = paths.setdefault(tuple(self._containers_by_context(c)), [])
+                    if (name, c) not in wanted:
+                        wanted.append((name, c))
+        found = {}
+        self._collect(self.config, (), paths, found)
+        return self._join_contexts(queries, found)
+
+    def _collect(self, container, path, paths, found):
+        wanted = paths.get(path, [])
+        for node in container:
+            if isinstance(node, Block):
+                self._collect(node.nodes, path + (node.name,), paths, found)
+                continue
+            for option, c in wanted:
+                if node.name == option:
+                    found.setdefault((option, c), []).append(self._matching_node(node))
+
     def _find(self, container, option, context=[]):
-        if context:
-            c = context.pop(0)
-        else:
-            c = ''
+        c, context = (context[0], context[1:]) if context else ('', [])
         ret = []
-        for name, value in container:
-            if isinstance(name, list) and name[0] == c:
-                ret.extend(self._find(value, option, context))
-            elif isinstance(name, str) and name == option and not c:
-                ret.append(MatchingNode(name, value, 0))
+        for node in container:
+            if isinstance(node, Block) and node.name == c:
+                ret.extend(self._find(node.nodes, option, context))
+            elif isinstance(node, Directive) and node.name == option and not c:
+                ret.append(self._matching_node(node))
         return ret
 
+    def _matching_node(self, directive):
+        return MatchingNode(directive.name, directive.value, directive.lineno, node=directive,
+                            source=directive.source)
+
     def _containers_by_context(self, context):
         d = {
             'http': ['http'],
@@ -59,9 +77,120 @@ class Nginx(Config):
 
     def fill_missing_line(self, option, value, context=None):
         line = '{} {};'.format(option, value)
-        if isinstance(context, list):
+        if isinstance(context, (list, tuple)):
             cl = self._containers_by_context(context[0])
             cl.reverse()
             for container in cl:
                 line = container + '{ ' + line + ' }'
         return line
+
+
+TOKEN_RE = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<open>\{)
+  | (?P<close>\})
+  | (?P<end>;)
+  | (?P<word>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|(?:\$\{|\\.|[^\s{};"'\\])(?:\$\{|\\.|[^\s{;\\])*)
+''', re.X | re.S)
+
+
+class NginxParser:
+    """
+    Parser of nginx configuration files
+
+    Directives and blocks keep the line and the file they were read from; files of include directives
+    are parsed in place of the directive.
+    """
+    def __init__(self):
+        self.includes = []
+
+    def parse(self, path, chain=(), prefix=None):
+        """
+        Load & parse configuration file
+
+        @type  path: string
+        @param path: configuration file path
+        @type  prefix: string
+        @param prefix: directory relative includes are resolved from, the one of the main configuration
+                       file as in nginx
+
+        @rtype: list
+        @return: top level nodes
+
+        @raise: Exception
+        """
+        text = SourceFile.open(path).text()
+        source = os.path.normpath(path) if chain else None
+        if prefix is None:
+            prefix = os.path.dirname(path)
+        chain += (os.path.realpath(path),)
+        root = []
+        stack = []
+        nodes, words = root, []
+        start, lineno = 0, 1
+        pos = 0
+        for match in TOKEN_RE.finditer(text):
+            if match.start() != pos:
+                break
+            pos = match.end()
+            kind = match.lastgroup
+            if kind in ('space', 'comment'):
+                continue
+            if kind == 'word':
+                if not words:
+                    lineno += text.count('\n', start, pos)
+                    start = pos
+                words.append(match)
+                continue
+            if kind == 'close':
+                if words or not stack:
+                    break
+                nodes = stack.pop()
+                continue
+            if not words:
+                if kind == 'end':
+                    continue
+                break
+            name = words[0].group()
+            value = text[words[1].start():words[-1].end()] if len(words) > 1 else ''
+            words = []
+            if kind == 'open':
+                block = Block(name, value, lineno, source)
+                nodes.append(block)
+                stack.append(nodes)
+                nodes = block.nodes
+            elif name == 'include':
+                nodes.extend(self._include(path, value, lineno, chain, prefix))
+            else:
+                nodes.append(Directive(name, typed(value), lineno, source))
+        if pos != len(text) or words or stack:
+            lineno += text.count('\n', start, pos)
+            raise Exception('Unexpected "{}" in {}, line {}'.format(text[pos:pos + 1] or 'end of file', path,
+                                                                 lineno))
+        return root
+
+    def _include(self, path, value, lineno, chain, prefix):
+        pattern = os.path.join(prefix, value.strip('"\''))
+        self.includes.append(os.path.dirname(pattern))
+        ret = []
+        for p in sorted(glob.glob(pattern)):
+            if os.path.realpath(p) in chain:
+                raise Exception('Recursive include of {} in {}, line {}'.format(p, path, lineno))
+            self.includes.append(p)
+            ret.extend(self.parse(p, chain, prefix))
+        return ret
+
+
+class Directive:
+    def __init__(self, name, value, lineno, source=None):
+        self.name = name
+        self.value = value
+        self.lineno = lineno
+        self.source = source
+
+
+class Block(Directive):
+    def __init__(self, name, value, lineno, source=None):
+        Directive.__init__(self, name, value, lineno, source)
+        self.nodes = []
@@ -22,12 +22,49 @@ class PassThroughOptionParser(OptionParser):
 
 parser = PassThroughOptionParser(usage="""usage: %prog [options] <"my config file">""")
 parser.add_option("-v", "--version", dest="version", action="store_true", default=False, help="show program version")
-parser.add_option("-r", "--report", dest="report", default=None, help="XML report filename",
-                  metavar="<report.xml>")
+parser.add_option("-r", "--report", dest="report", default=None,
+                  help="Report filename; reports named *.gz are compressed", metavar="<report.xml>")
+parser.add_option("--report-format", dest="report_format", type="choice", choices=['xml', 'jsonl', 'sarif'],
+                  default='xml', help="Report format: xml, jsonl (a finding per line) or sarif", metavar="<format>")
 parser.add_option("-P", "--pipe", dest="pipe", default=None, help="UI pipe name", metavar="<Pipe_N>")
 parser.add_option("--user-rules", dest="user_rules", default=None, help="User rules filename")
 parser.add_option("--preprocessing", dest="preprocessing", action="store_true", default=False, help="Preprocessing mode")
 parser.add_option("--logs-dir", dest="logs_dir", default=None, help="Log path name")
+parser.add_option("--state-file", dest="state_file", default=None,
+                  help="File to keep scan state in; unchanged files are not parsed again", metavar="<state.json>")
+parser.add_option("--exclude", dest="exclude", action="append", default=None,
+                  help="Glob of file or directory names (or paths relative to the scanned directory) to skip; "
+                       "may be given several times", metavar="<glob>")
+parser.add_option("--prune-dir", dest="prune_dirs", action="append", default=None,
+                  help="Directory name not to descend into; may be given several times "
+                       "(default: .git, .hg, .svn, node_modules)", metavar="<name>")
+parser.add_option("--max-file-size", dest="max_file_size", type="int", default=None,
+                  help="Skip configuration files larger than this", metavar="<bytes>")
+parser.add_option("--max-depth", dest="max_depth", type="int", default=None,
+                  help="Do not descend more than N directories below the scanned one", metavar="<N>")
+parser.add_option("--xml-stream-size", dest="xml_stream_size", type="int", default=32 << 20,
+                  help="Parse XML files larger than this incrementally, keeping only what the rules can reach",
+                  metavar="<bytes>")
+parser.add_option("--parse-cache", dest="parse_cache", default=None,
+                  help="Directory to keep parsed configurations in between scans", metavar="<dir>")
+parser.add_option("--parse-cache-size", dest="parse_cache_size", type="int", default=256 << 20,
+                  help="Remove least recently used entries of the parse cache above this size", metavar="<bytes>")
+parser.add_option("--result-cache", dest="result_cache", default=None,
+                  help="Directory to keep findings in by file content; it can be shared between hosts",
+                  metavar="<dir>")
+parser.add_option("--result-cache-size", dest="result_cache_size", type="int", default=64 << 20,
+                  help="Remove least recently used entries of the result cache above this size", metavar="<bytes>")
+parser.add_option("--prefilter-size", dest="prefilter_size", type="int", default=64 << 10,
+                  help="Search files up to this size for option names before matching them, 0 to disable",
+                  metavar="<bytes>")
+parser.add_option("--no-query-memo", dest="query_memo", action="store_false", default=True,
+                  help="Search the parsed configuration again for repeated queries of an option")
+parser.add_option("-j", "--jobs", dest="jobs", type="int", default=1, help="Number of worker processes",
+                  metavar="<N>")
+parser.add_option("--daemon", dest="daemon", default=None,
+                  help="Serve scan jobs on a Unix domain socket instead of scanning", metavar="<socket>")
+parser.add_option("--daemon-timeout", dest="daemon_timeout", type="float", default=30,
+                  help="Seconds a daemon client may stay idle before it is disconnected", metavar="<N>")
 parser.add_option("--temp-dir", dest="temp_dir", default=None, help="not supported")
 parser.add_option("--result-protocol", help="not supported")
 
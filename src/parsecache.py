@@ -0,0 +1,80 @@
+import gc
+import pickle
+import zlib
+from cachedir import CacheDir
+from log import Log
+from sourcefile import SourceFile
+
+VERSION = 1
+
+
+class ParseCache(CacheDir):
+    """
+    On-disk cache of parsed configurations
+
+    Entries are keyed by the content hash of the configuration file, the configuration class and its
+    parser version, so they survive rule updates. An entry also records the size and mtime of the
+    files the configuration includes and is not used if any of them changed.
+    """
+    suffix = '.pz'
+
+    @classmethod
+    def get(cls, options):
+        """
+        Return the parse cache of the scan, or None if it is disabled
+
+        @rtype: ParseCache
+        """
+        if not options.parse_cache:
+            return None
+        return cls._open(options.parse_cache, options.parse_cache_size, Log(options.logs_dir))
+
+    def load(self, fname, key, parse, dependencies=None):
+        """
+        Return the parsed configuration from the cache, parsing and caching it on a miss
+
+        @type  fname: string
+        @param fname: configuration file name
+        @type  key: tuple
+        @param key: configuration class, parser version and whatever else the parser output depends on
+        @type  parse: function
+        @param parse: parses the file; its result must be picklable
+        @type  dependencies: function
+        @param dependencies: returns files (and searched directories) the parse result was read from
+
+        @rtype: object
+        """
+        entry = self.entry(SourceFile.open(fname).digest(), (VERSION,) + key)
+        value = self._load(entry)
+        if value is not None:
+            return value
+        value = parse()
+        deps = dependencies(value) if dependencies else []
+        self._save(entry, {dep: self.stat(dep) for dep in deps}, value)
+        return value
+
+    def _load(self, entry):
+        data = self.read(entry)
+        if data is None:
+            return None
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            deps, value = pickle.loads(zlib.decompress(data))
+        except Exception as e:
+            self.log.write("Parse cache entry {} is ignored: {}".format(entry, e))
+            return None
+        finally:
+            if enabled:
+                gc.enable()
+        if any(self.stat(dep) != st for dep, st in deps.items()):
+            return None
+        return value
+
+    def _save(self, entry, deps, value):
+        try:
+            data = zlib.compress(pickle.dumps((deps, value), pickle.HIGHEST_PROTOCOL), 1)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as e:
+            self.log.write("Parse result of {} is not cached: {}".format(entry, e))
+            return
+        self.write(entry, data)
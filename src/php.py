@@ -1,13 +1,17 @@
+import io
 from configparser import *
 from baseconfig import Config, MatchingNode
+from sourcefile import SourceFile
+from values import Flag, to_number, typed
 
 
 class Php(Config):
     conftype = 'php.ini'
+    parser_version = 2
 
     def __init__(self, path, options):
         Config.__init__(self, path, options)
-        self.config = PhpConf().parse(path).config
+        self.config = self.parse_cached(lambda: PhpConf().parse(path).config)
 
     def find_nodes(self, name, context=None):
         if self.has(name):
@@ -31,14 +35,7 @@ class Php(Config):
         return option + ' = ' + value
 
     def biggerThan(self, option, advice):
-        factor = {'k': 1024,
-                  'm': 1024 ** 2,
-                  'g': 1024 ** 3
-                  }
-        option_int = int(option) if option.isdigit() else int(option[:-1]) * factor[option[-1:].lower()]
-        advice_int = int(advice) if advice.isdigit() else int(advice[:-1]) * factor[advice[-1:].lower()]
-
-        return True if option_int > advice_int else False
+        return to_number(typed(option)) > to_number(typed(advice))
 
 
 class PhpConf(RawConfigParser):
@@ -47,7 +44,7 @@ class PhpConf(RawConfigParser):
     def parse(self, path):
 
         config = {}
-        self._read(open(path), path)
+        self._read(io.StringIO(SourceFile.open(path).text()), path)
 
         for section in self.sections():
             for (key, value) in self.items(section):
@@ -56,11 +53,13 @@ class PhpConf(RawConfigParser):
                 valueLowerCase = value['optval'].lower()
 
                 if valueLowerCase in ['on', 'true', '1', ]:
-                    value['optval'] = '1'
+                    value['optval'] = Flag.make('1', 1)
                 elif valueLowerCase in ['false', 'off', 'no', '0']:
-                    value['optval'] = '0'
+                    value['optval'] = Flag.make('0', 0)
                 elif value['optval'] in ['null', 'none', '']:
                     value['optval'] = ''
+                else:
+                    value['optval'] = typed(value['optval'])
 
                 config[key] = MatchingNode(key, value['optval'], value['lineno'])
 
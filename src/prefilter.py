@@ -0,0 +1,74 @@
+LOWER = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', b'abcdefghijklmnopqrstuvwxyz')
+
+
+class Prefilter:
+    """
+    Aho-Corasick automaton finding which of a set of words occur in a text
+
+    Words are matched case-insensitively (ASCII only) in a single pass over the raw bytes.
+    """
+    def __init__(self, words):
+        self.words = sorted(set(w.lower() for w in words))
+        goto = [{}]
+        outputs = [0]
+        for i, word in enumerate(self.words):
+            state = 0
+            for c in word.encode('utf-8'):
+                nxt = goto[state].get(c)
+                if nxt is None:
+                    nxt = goto[state][c] = len(goto)
+                    goto.append({})
+                    outputs.append(0)
+                state = nxt
+            outputs[state] |= 1 << i
+        self.delta, self.outputs = self._build(goto, outputs)
+        self.all = (1 << len(self.words)) - 1
+
+    @staticmethod
+    def _build(goto, outputs):
+        """
+        Turn the trie into a DFA
+
+        @rtype: tuple
+        @return: transitions (state -> byte -> state, missing bytes lead to the root) and
+                 bit sets of the words ending in every state
+        """
+        delta = [dict(goto[0])]
+        delta.extend({} for _ in goto[1:])
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for c, nxt in goto[state].items():
+                queue.append(nxt)
+                fail[nxt] = delta[fail[state]].get(c, 0) if state else 0
+                outputs[nxt] |= outputs[fail[nxt]]
+            if state:
+                moves = dict(delta[fail[state]])
+                moves.update(goto[state])
+                delta[state] = moves
+        return delta, outputs
+
+    def search(self, data):
+        """
+        Find the words occurring in the data
+
+        @type  data: bytes
+        @param data: raw text
+
+        @rtype: set
+        """
+        delta, outputs, everything = self.delta, self.outputs, self.all
+        found = 0
+        state = 0
+        for c in data.translate(LOWER):
+            state = delta[state].get(c, 0)
+            if outputs[state]:
+                found |= outputs[state]
+                if found == everything:
+                    break
+        ret = set()
+        while found:
+            bit = found & -found
+            ret.add(self.words[bit.bit_length() - 1])
+            found ^= bit
+        return ret
@@ -0,0 +1,92 @@
+import json
+from cachedir import CacheDir
+from httpgen import load_vuln
+from log import Log
+
+VERSION = 3
+
+
+class ResultCache(CacheDir):
+    """
+    On-disk cache of findings keyed by configuration type, its parser version, content hash and rule set
+    digest
+
+    Findings are saved without the path of the file and are rebuilt for any file with the same
+    content, so the cache can be shared by scans of different hosts. Configurations that include
+    other files are not cached, their findings depend on more than their own content. Entry names
+    only hold a checksum of the key, so entries keep the whole key and are checked against it.
+    """
+    suffix = '.json'
+
+    @classmethod
+    def get(cls, options):
+        """
+        Return the result cache of the scan, or None if it is disabled
+
+        @rtype: ResultCache
+        """
+        if not options.result_cache:
+            return None
+        return cls._open(options.result_cache, options.result_cache_size, Log(options.logs_dir))
+
+    def lookup(self, cls, fname, snapshot, options):
+        """
+        Return findings of a file with the same content scanned before
+
+        @type  cls: class
+        @param cls: configuration class of the file
+        @type  fname: string
+        @param fname: file name
+        @type  snapshot: dict
+        @param snapshot: size, mtime and content hash of the file, as returned by ScanState.snapshot
+
+        @rtype: tuple
+        @return: findings and the scan state entry of the file, or None if the content was not seen
+        """
+        key = self._key(cls, options, snapshot['hash'])
+        entry = self.entry(snapshot['hash'], key)
+        data = self.read(entry)
+        if data is None:
+            return None
+        try:
+            cached = json.loads(data.decode('utf-8'))
+            if cached['key'] != key:
+                self.log.write("Result cache entry {} is ignored: it was written for {}".format(entry,
+                                                                                             cached['key']))
+                return None
+            vulns = []
+            for fields in cached['findings']:
+                fields.update(entry=fname, file=fname)
+                vulns.append(load_vuln(fields))
+            meta = dict(snapshot, conftype=cached['conftype'], parser=cls.parser_version, rules=cached['rules'],
+                        deps={})
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.log.write("Result cache entry {} is ignored: {}".format(entry, e))
+            return None
+        return vulns, meta
+
+    def store(self, cls, fname, meta, vulns, options):
+        """
+        Save findings of a scanned file, unless they depend on other files
+
+        @type  meta: dict
+        @param meta: scan state entry of the file, as returned by ScanState.describe
+        """
+        if meta['deps'] or any(v.entry != fname or v.file != fname for v in vulns):
+            return
+        findings = []
+        for vuln in vulns:
+            fields = vuln.dump()
+            del fields['entry'], fields['file']
+            findings.append(fields)
+        key = self._key(cls, options, meta['hash'])
+        cached = {'key': key, 'conftype': meta['conftype'], 'rules': meta['rules'], 'findings': findings}
+        self.write(self.entry(meta['hash'], key), json.dumps(cached).encode('utf-8'))
+
+    @staticmethod
+    def _key(cls, options, digest):
+        """
+        @rtype: list
+        @return: everything the findings depend on, as saved in the entry
+        """
+        return [VERSION, cls.__name__, cls.parser_version, cls.rules_digest(options), digest]
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import operator
+import os
+import re
+import sys
+from log import Log
+from values import Duration, to_number, typed
+
+NUMERIC_OPS = {'<=': operator.le, '>=': operator.ge, '>': operator.gt, '<': operator.lt}
+METHODS = {'any': any, 'all': all}
+
+
+class InvalidRule(Exception):
+    pass
+
+
+def compile_predicate(values, op, method, duration=False):
+    """
+    Compile a comparison of an existing value with the rule values
+
+    @type  values: list
+    @param values: compiled rule values (strings, integers, patterns or arrays of them)
+    @type  op: string
+    @param op: comparison type
+    @type  method: string
+    @param method: "any" or "all" of the values have to match
+    @type  duration: bool
+    @param duration: the values are durations, read "m" suffixes of existing values as minutes
+
+    @rtype: function
+    @return: predicate taking the existing value
+    """
+    try:
+        combine = METHODS[method]
+    except KeyError:
+        raise InvalidRule("Unsupported comparison method {}".format(method))
+    checks = [compile_check(v, op, duration) for v in values]
+    if len(checks) == 1:
+        return checks[0]
+    return lambda existing: combine([check(existing) for check in checks])
+
+
+def compile_check(left, op, duration=False):
+    if isinstance(left, dict):
+        return compile_array_check(left, op, duration)
+    if op == 'equal':
+        left = str(left).lower()
+        return lambda right: str(right).lower() == left
+    elif op == 'in':
+        left = str(left)
+        return lambda right: left in str(right)
+    elif op in NUMERIC_OPS:
+        cmp = NUMERIC_OPS[op]
+        return lambda right: cmp(to_number(right, duration), left)
+    elif op == 'regexp':
+        return lambda right: left.match(str(right)) is not None
+    raise InvalidRule("Unsupported comparison type {}".format(op))
+
+
+def compile_array_check(left, op, duration=False):
+    if op in ['equal', 'in']:
+        items = list(left.items())
+        size = len(items) if op == 'equal' else None
+
+        def check(right):
+            if not hasattr(right, 'offset') or (size is not None and len(right.items) != size):
+                return False
+            return all(right.offset(key) == value for key, value in items)
+        return check
+    checks = [(key, compile_check(value, op, duration)) for key, value in left.items()]
+    return lambda right: hasattr(right, 'offset') and all(check(right.offset(key)) for key, check in checks)
+
+
+class Rule:
+    """
+    Compiled rule
+
+    Rule fields are validated and normalized once, when the rule set is compiled: regular expressions
+    are compiled and values of numeric comparisons are converted to integers. A rule is about a duration
+    if its "value_type" is "duration" or, without a "value_type", if one of its values has a s/h/d
+    suffix; an "m" suffix then means minutes rather than megabytes, in the rule and in the configuration.
+    """
+    __slots__ = ('rule', '_name', '_id', '_xpath', '_comparison_type', '_comparison_method', '_default',
+                 '_recommended', '_not_recommended', '_regexp', '_type', '_duration', '_predicate',
+                 '_nr_predicate')
+
+    def __init__(self, rule):
+        init = lambda name, value: object.__setattr__(self, name, value)
+        init('rule', rule)
+        try:
+            init('_name', rule['name'].split('[')[0])
+            init('_type', rule['conftype'])
+            init('_id', rule['conftype'] + ' ' + rule['name'])
+            init('_recommended', self._as_tuple(rule['recommended']))
+        except KeyError as e:
+            raise InvalidRule("Field {} is missing in rule {}".format(e, rule))
+        init('_duration', self._is_duration(rule))
+        init('_default', typed(rule.get('default'), self._duration))
+        init('_xpath', self._as_tuple(rule['xpath']) if 'xpath' in rule else '')
+        init('_comparison_type', rule.get('comparison_type', 'equal'))
+        init('_comparison_method', rule.get('comparison_method', 'any'))
+        init('_not_recommended', self._as_tuple(rule.get('not_recommended', [])))
+        init('_regexp', self._as_tuple(rule['regexp']) if 'regexp' in rule else None)
+        init('_predicate', self._compile_predicate(self._regexp or self._recommended))
+        init('_nr_predicate', self._compile_predicate(self._not_recommended))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Rule is immutable")
+
+    def _as_tuple(self, value):
+        return tuple(value) if isinstance(value, list) else (value,)
+
+    def _is_duration(self, rule):
+        if 'value_type' in rule:
+            return rule['value_type'] == 'duration'
+        values = (rule.get('default'),) + self._recommended + self._as_tuple(rule.get('not_recommended', []))
+        return any(isinstance(typed(v), Duration) for v in values)
+
+    def _compile_predicate(self, values):
+        return compile_predicate([self._compile(v) for v in values], self._comparison_type,
+                                 self._comparison_method, self._duration)
+
+    def _compile(self, value):
+        if isinstance(value, dict):
+            return {key: self._compile(v) for key, v in value.items()}
+        try:
+            if self._comparison_type == 'regexp':
+                return re.compile(value)
+            if self._comparison_type in NUMERIC_OPS:
+                return to_number(typed(value, self._duration))
+        except (re.error, ValueError, TypeError) as e:
+            raise InvalidRule("Bad value {} in rule {}: {}".format(value, self.rule, e))
+        return value
+
+    def name(self):
+        return self._name
+
+    def id(self):
+        return self._id
+
+    def xpath(self):
+        return self._xpath
+
+    def query(self):
+        """
+        Key of the nodes the rule is matched against
+
+        @rtype: tuple
+        @return: (option name, contexts)
+        """
+        return self._name, self._xpath
+
+    def comparison_type(self):
+        return self._comparison_type
+
+    def comparison_method(self):
+        return self._comparison_method
+
+    def default_value(self):
+        return self._default
+
+    def recommended_values(self):
+        return self._recommended
+
+    def recommended_value(self):
+        if self._comparison_method == 'all':
+            return ', '.join(self._recommended)
+        return self._recommended[0]
+
+    def not_recommended_values(self):
+        return self._not_recommended
+
+    def regexp(self):
+        return self._regexp
+
+    def is_recommended(self, existing):
+        """
+        Check the value against the recommended values (or regular expressions)
+
+        @rtype: bool
+        """
+        return self._predicate(existing)
+
+    def is_not_recommended(self, existing):
+        """
+        Check the value against the not recommended values
+
+        @rtype: bool
+        """
+        return self._nr_predicate(existing)
+
+    def type(self):
+        return self._type
+
+
+class RuleSet:
+    """
+    Inner and user rules of a configuration type
+
+    Rule sets are compiled once per process and shared by every file of the configuration type; a rule set
+    with user rules is compiled again when the user rules file changes.
+    """
+    _compiled = {}
+    _user_rules = {}
+
+    def __init__(self, conftype, user_rules, log):
+        self.conftype = conftype
+        self.log = log
+        rules = self.load_rules(os.path.join(self.getappdir(), 'inner_rules/{}.js'.format(conftype)))
+        if user_rules:
+            rules.extend(self._get_user_rules(self._load_user_rules(user_rules)))
+        self.digest = hashlib.sha1(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+        self.rules = tuple(filter(None, [self._compile(rule) for rule in rules]))
+        self.queries = self._index_queries()
+
+    @classmethod
+    def get(cls, conftype, options):
+        """
+        Return the compiled rule set of the configuration type
+
+        @type  conftype: string
+        @param conftype: configuration type
+
+        @rtype: RuleSet
+        """
+        key = (conftype, options.user_rules, options.user_rules and cls._stamp(options.user_rules))
+        try:
+            return cls._compiled[key]
+        except KeyError:
+            ruleset = cls._compiled[key] = cls(conftype, options.user_rules, Log(options.logs_dir))
+            return ruleset
+
+    @staticmethod
+    def getappdir():
+        if getattr(sys, 'frozen', False):
+            application_path = os.path.dirname(sys.executable)
+            prod = os.path.join(application_path, '../config')
+            dev = os.path.join(application_path, '../dist')
+            return prod if os.path.exists(prod) else dev
+        else:
+            return os.path.join(os.path.dirname(__file__))
+
+    @staticmethod
+    def _stamp(fname):
+        try:
+            st = os.stat(fname)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def load_rules(fname):
+        with open(os.path.realpath(fname), 'r') as f:
+            ret = json.load(f)
+        return ret
+
+    def _load_user_rules(self, fname):
+        key = (fname, self._stamp(fname))
+        try:
+            return self._user_rules[key]
+        except KeyError:
+            ret = self._user_rules[key] = self.load_rules(fname)
+            return ret
+
+    def _get_user_rules(self, l):
+        ret = []
+        for rule in l:
+            first = rule[0] if isinstance(rule, list) and rule else rule
+            if isinstance(first, dict) and first.get('conftype') == self.conftype:
+                ret.append(rule)
+        return ret
+
+    def _index_queries(self):
+        """
+        Index the rules by option name
+
+        @rtype: dict
+        @return: option name -> list of contexts the option is searched in
+        """
+        queries = {}
+        for rule in self.rules:
+            for r in rule if isinstance(rule, tuple) else [rule]:
+                name, context = r.query()
+                contexts = queries.setdefault(name, [])
+                if context not in contexts:
+                    contexts.append(context)
+        return queries
+
+    def _compile(self, rule):
+        try:
+            if isinstance(rule, list):
+                return tuple(self._compile_one(r) for r in rule)
+            return self._compile_one(rule)
+        except InvalidRule as e:
+            self.log.write(e)
+
+    def _compile_one(self, rule):
+        if 'default' not in rule:
+            self.log.write("Default value is missing in rule {}".format(rule))
+        if rule.get('comparison_type') == 'regexp' and 'regexp' not in rule:
+            self.log.write("Regular expression is missing in rule {}".format(rule))
+        return Rule(rule)
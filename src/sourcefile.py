@@ -0,0 +1,132 @@
+import hashlib
+import io
+import locale
+import mmap
+import os
+import tokenize
+from lineindex import LineIndex
+
+
+def detect_encoding(data):
+    """
+    Detect the encoding of a file from a UTF-8 BOM or a coding comment in its first two lines, like
+    files read for tracebacks
+
+    @type  data: bytes
+    @param data: beginning of the file
+
+    @rtype: string
+    """
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+    except SyntaxError:
+        return 'utf-8'
+    return encoding
+
+
+class SourceFile:
+    """
+    Contents of a file read once per scanned configuration
+
+    The prefilter, the parsers, the content hash and line lookups of a file share its contents: files
+    smaller than MMAP_SIZE are read at once, larger ones are mapped to memory. Files stay open until
+    release is called, at the end of the scan of a configuration.
+    """
+    MMAP_SIZE = 16 << 20
+    _opened = {}
+
+    def __init__(self, fname):
+        self.name = fname
+        with open(fname, 'rb') as f:
+            if os.fstat(f.fileno()).st_size >= self.MMAP_SIZE:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = f.read()
+        self.size = len(self.data)
+        self.encoding = detect_encoding(self.data[:4096])
+        self._digest = None
+        self._lines = None
+
+    @classmethod
+    def open(cls, fname):
+        """
+        Return the contents of the file, reading it on the first call until release
+
+        @type  fname: string
+        @param fname: file name
+
+        @rtype: SourceFile
+
+        @raise: OSError
+        """
+        try:
+            return cls._opened[fname]
+        except KeyError:
+            ret = cls._opened[fname] = cls(fname)
+            return ret
+
+    @classmethod
+    def release(cls):
+        """
+        Close the files opened since the last call
+        """
+        for source in cls._opened.values():
+            source.close()
+        cls._opened.clear()
+
+    def text(self):
+        """
+        Decode the file like open() in text mode: \\r\\n and \\r line ends are turned into \\n and files
+        that are not valid in the detected encoding are decoded with the locale encoding
+
+        @rtype: string
+
+        @raise: UnicodeDecodeError
+        """
+        try:
+            text = str(self.data, self.encoding)
+        except UnicodeDecodeError:
+            fallback = locale.getpreferredencoding(False)
+            text = str(self.data, fallback)
+            self.encoding = fallback
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def chunks(self, size=1 << 16):
+        """
+        Iterate over the raw contents of the file
+
+        @type  size: int
+        @param size: size of the chunks
+
+        @rtype: iterator
+        """
+        for start in range(0, self.size, size):
+            yield self.data[start:start + size]
+
+    def digest(self):
+        """
+        @rtype: string
+        @return: SHA-1 of the contents, as computed by utils.file_digest
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.data).hexdigest()
+        return self._digest
+
+    def line(self, lineno):
+        """
+        Return a line of the file, indexing its lines on the first call
+
+        @type  lineno: int
+        @param lineno: line number, starting at 1
+
+        @rtype: string
+        @return: line with its end, or an empty string if there is no such line
+        """
+        if self._lines is None:
+            self._lines = LineIndex(self.data, self.encoding)
+        return self._lines.line(lineno)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
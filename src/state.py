@@ -0,0 +1,131 @@
+import json
+import os
+from baseconfig import Config
+from httpgen import load_vuln
+from rules import RuleSet
+from sourcefile import SourceFile
+from utils import file_digest
+
+
+class ScanState:
+    """
+    Manifest of scanned files kept between scans
+
+    Every entry records the file size, mtime, content hash, parser version, rule set digest and the
+    included files the configuration depends on, together with the findings of the file.
+    """
+    VERSION = 1
+
+    def __init__(self, fname, options, log):
+        self.fname = fname
+        self.options = options
+        self.log = log
+        self.files = {}
+        self.seen = set()
+        try:
+            with open(fname, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == self.VERSION:
+                self.files = state['files']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            self.log.write("Scan state {} is ignored: {}".format(fname, e))
+
+    def lookup(self, fname):
+        """
+        Return findings of the file saved by a previous scan
+
+        @type  fname: string
+        @param fname: file name
+
+        @rtype: list or None
+        @return: findings, or None if the file has to be scanned again
+        """
+        self.seen.add(fname)
+        entry = self.files.get(fname)
+        if entry is None:
+            return None
+        try:
+            if not self._unchanged(fname, entry):
+                return None
+        except (OSError, ValueError) as e:
+            self.log.write("Scan state of {}: {}".format(fname, e))
+            return None
+        return [load_vuln(v) for v in entry['findings']]
+
+    def _unchanged(self, fname, entry):
+        if RuleSet.get(entry['conftype'], self.options).digest != entry['rules']:
+            return False
+        cls = Config.by_conftype(entry['conftype'])
+        if cls is None or entry.get('parser') != cls.parser_version:
+            return False
+        if any(self.stat(dep) != st for dep, st in entry['deps'].items()):
+            return False
+        st = self.stat(fname)
+        if st != entry['stat']:
+            if file_digest(fname) != entry['hash']:
+                return False
+            entry['stat'] = st
+        return True
+
+    def record(self, fname, meta, vulns):
+        """
+        Save findings of a scanned file
+
+        @type  meta: dict
+        @param meta: conftype, parser, rules, deps, stat and hash of the scanned file, as returned by
+                     ConfigAnalyzer.checkfile
+        @type  vulns: list
+        @param vulns: findings of the file; they are saved before being sent
+        """
+        self.seen.add(fname)
+        entry = dict(meta)
+        entry['findings'] = [v.dump() for v in vulns]
+        self.files[fname] = entry
+
+    def save(self, root):
+        """
+        Write the manifest, dropping entries of files under the scanned path that were not found
+
+        @type  root: string
+        @param root: scanned path
+        """
+        root = os.path.join(root, '')
+        self.files = {fname: entry for fname, entry in self.files.items()
+                      if fname in self.seen or not fname.startswith(root)}
+        tmp = self.fname + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'files': self.files}, f)
+        os.replace(tmp, self.fname)
+
+    @staticmethod
+    def stat(fname):
+        try:
+            st = os.stat(fname)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    @classmethod
+    def snapshot(cls, fname):
+        """
+        Take size, mtime and content hash of a file before it is parsed
+
+        @rtype: dict
+        """
+        return {'stat': cls.stat(fname), 'hash': SourceFile.open(fname).digest()}
+
+    @classmethod
+    def describe(cls, config, snapshot):
+        """
+        Build the manifest entry of a parsed configuration, findings aside
+
+        @rtype: dict
+        """
+        ret = dict(snapshot)
+        ret['conftype'] = config.conftype
+        ret['parser'] = config.parser_version
+        ret['rules'] = config.ruleset.digest
+        ret['deps'] = {dep: cls.stat(dep) for dep in config.dependencies()}
+        return ret
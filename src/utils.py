@@ -1,19 +1,7 @@
 import sys
 import os
 import wmi
-import linecache
-
-
-def write_file(fname, s, mode=''):
-    f = open(fname, 'w' + mode, encoding='utf-8')
-    f.write(s)
-    f.close()
-
-
-def append_file(fname, s, mode=''):
-    f = open(fname, 'a' + mode, encoding='utf-8')
-    f.write(s)
-    f.close()
+import hashlib
 
 
 def is_frozen():
@@ -28,10 +16,34 @@ def check_disk_free_space(path):
         sys.exit("<error>Not enough free disk space</error>")
 
 
-def file_line(fname, lineno):
+def file_digest(fname):
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def peak_rss():
+    """
+    Peak resident set size (working set on Windows) of the process in bytes
+    """
     try:
-        return linecache.getline(fname, lineno).strip()
-    except UnicodeDecodeError:
-        with open(fname, 'r') as f:
-            lines = f.readlines()
-        return lines[lineno - 1].strip()
+        import resource
+    except ImportError:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in (
+                        'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                        'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage',
+                        'PeakPagefileUsage')]
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
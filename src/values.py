@@ -0,0 +1,112 @@
+import re
+
+NUMBER_RE = re.compile(r'-?(\d+)(.*)')
+TYPED_RE = re.compile(r'([-+]?\d+)([kmgshd]?)', re.I)
+SIZE_FACTOR = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+DURATION_FACTOR = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+FLAGS = {'on': 1, 'off': 0, 'true': 1, 'false': 0, 'yes': 1, 'no': 0, 'enable': 1, 'disable': 0}
+FLAG_LENGTH = max(len(flag) for flag in FLAGS)
+FLAG_INITIALS = frozenset(c for flag in FLAGS for c in (flag[0], flag[0].upper()))
+DIGITS = frozenset('0123456789-+')
+
+
+class Value(str):
+    """
+    Option value as written in the configuration, together with the number it stands for
+
+    Values are typed once, when the configuration is parsed; string comparisons see the text and
+    numeric comparisons use the number.
+    """
+    number = None
+
+    @classmethod
+    def make(cls, text, number):
+        value = cls(text)
+        value.number = number
+        return value
+
+
+class Flag(Value):
+    """
+    Boolean value, 1 or 0
+    """
+
+
+class Integer(Value):
+    pass
+
+
+class Size(Value):
+    """
+    Integer with a k/m/g suffix, in bytes
+    """
+
+
+class Duration(Value):
+    """
+    Integer with a s/m/h/d suffix, in seconds
+
+    An "m" suffix means minutes only for values of duration options, see typed; it is a size otherwise.
+    """
+
+
+def typed(value, duration=False):
+    """
+    Type an option value
+
+    @type  value: string
+    @param value: option value as written in the configuration
+    @type  duration: bool
+    @param duration: the option is a duration, so that an "m" suffix is read as minutes, not megabytes
+
+    @rtype: string
+    @return: Flag, Integer, Size or Duration, or the value itself if it is none of them
+    """
+    if value.__class__ is not str or not value:
+        return value
+    first = value[0]
+    if first in DIGITS:
+        match = TYPED_RE.fullmatch(value)
+        if match is None:
+            return value
+        number, unit = match.groups()
+        if not unit:
+            return Integer.make(value, int(number))
+        unit = unit.lower()
+        if unit in SIZE_FACTOR and not (duration and unit in DURATION_FACTOR):
+            return Size.make(value, int(number) * SIZE_FACTOR[unit])
+        return Duration.make(value, int(number) * DURATION_FACTOR[unit])
+    if len(value) > FLAG_LENGTH or first not in FLAG_INITIALS:
+        return value
+    flag = FLAGS.get(value.lower())
+    if flag is None:
+        return value
+    return Flag.make(value, flag)
+
+
+def to_number(value, duration=False):
+    """
+    Convert a value with an optional k/m/g suffix to an integer
+
+    Typed values are not parsed again, except sizes with an "m" suffix, which are minutes when the
+    option is a duration. Untyped ones are read leniently: the sign and unknown suffixes are ignored.
+
+    @type  value: string
+    @param value: option value, e.g. "128M"
+    @type  duration: bool
+    @param duration: the option is a duration, see typed
+
+    @rtype: int
+    @raise: ValueError
+    """
+    if isinstance(value, Value):
+        if duration and value.__class__ is Size:
+            return typed(str(value), duration).number
+        return value.number
+    match = NUMBER_RE.match(value)
+    if not match:
+        raise ValueError("Value {} is not a number".format(value))
+    suffix = match.group(2).lower()
+    if duration and suffix in DURATION_FACTOR:
+        return int(match.group(1)) * DURATION_FACTOR[suffix]
+    return int(match.group(1)) * SIZE_FACTOR.get(suffix, 1)
@@ -0,0 +1,91 @@
+import os
+from fnmatch import fnmatch
+
+PRUNE_DIRS = ('.git', '.hg', '.svn', 'node_modules')
+
+
+class Walker:
+    """
+    Directory walker yielding the files to scan
+
+    Basenames are matched against the supported configuration names before anything else is done
+    with a file, so unrelated files cost one directory entry each. Files are yielded in os.walk order:
+    files of a directory first, then its subdirectories; symbolic links to directories are not followed.
+    """
+    def __init__(self, names, options, log):
+        """
+        @type  names: collection
+        @param names: lowercase basenames of supported configuration files
+        """
+        self.names = names
+        self.exclude = options.exclude or []
+        self.prune = {d.lower() for d in (PRUNE_DIRS if options.prune_dirs is None else options.prune_dirs)}
+        self.max_size = options.max_file_size
+        self.max_depth = options.max_depth
+        self.log = log
+
+    def walk(self, top):
+        """
+        @type  top: string
+        @param top: directory to scan
+
+        @rtype: generator
+        @return: file names
+        """
+        return self._walk(top, '', 0)
+
+    def file(self, fname):
+        """
+        Filter a file given as the scan target like the walked files
+
+        @type  fname: string
+        @param fname: file to scan
+
+        @rtype: list
+        @return: the file name, or nothing if the file is not scanned
+        """
+        name = os.path.basename(fname)
+        if name.lower() in self.names and self._accept(name, fname, '', lambda: os.stat(fname)):
+            return [fname]
+        return []
+
+    def _walk(self, top, rel, depth):
+        try:
+            with os.scandir(top) as it:
+                entries = list(it)
+        except OSError as e:
+            self.log.write(e)
+            return
+        dirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirs.append(entry)
+            elif entry.name.lower() in self.names and self._accept(entry.name, entry.path, rel, entry.stat):
+                yield entry.path
+        if self.max_depth is not None and depth >= self.max_depth:
+            return
+        for entry in dirs:
+            if entry.name.lower() in self.prune or self._excluded(entry.name, rel) or entry.is_symlink():
+                continue
+            yield from self._walk(entry.path, rel + entry.name + '/', depth + 1)
+
+    def _accept(self, name, path, rel, stat):
+        if self._excluded(name, rel):
+            return False
+        if self.max_size is not None:
+            try:
+                size = stat().st_size
+            except OSError as e:
+                self.log.write(e)
+                return False
+            if size > self.max_size:
+                self.log.write("Skipped: {} ({} bytes)".format(path, size))
+                return False
+        return True
+
+    def _excluded(self, name, rel):
+        return any(fnmatch(name, pattern) or fnmatch(rel + name, pattern) for pattern in self.exclude)
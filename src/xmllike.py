@@ -1,40 +1,248 @@
+import re
 from lxml.etree import *
+from lxml.etree import XMLPullParser
 from baseconfig import Config, MatchingNode
+from log import Log
+from sourcefile import SourceFile
+from utils import peak_rss
+from values import typed
+
+
+# quoted strings, attributes, variables and numbers, element names, function calls and axes
+PATH_TOKEN = re.compile(r'''("[^"]*"|'[^']*'|[@$][\w.:-]+|\d+(?:\.\d+)?)|([A-Za-z_][\w.-]*)(\s*[(:])?''')
+OPERATORS = {'and', 'or', 'div', 'mod'}
+# leading descendant step of a path and the rest of it
+DESCENDANT_STEP = re.compile(r'\.//([A-Za-z_][\w.-]*)(?![\w.(:-])(.*)$')
+POSITIONAL = re.compile(r'\[\s*\d|last\(|position\(')
 
 
 class NotSuitable(Exception):
     pass
 
 
+def local_names(path):
+    """
+    Make element names of a path match elements of any namespace
+
+    @rtype: string
+    @return: path with name tests replaced by *[local-name()="name"]
+    """
+    def step(m):
+        if m.group(1) or m.group(3) or m.group(2) in OPERATORS:
+            return m.group(0)
+        return '*[local-name()="{}"]'.format(m.group(2))
+    return PATH_TOKEN.sub(step, path)
+
+
+class ExtendedContext(str):
+    """
+    Context extended with option values, e.g. add[@name="Sql"]
+
+    The values are passed to the compiled path as XPath variables instead of being spliced into it, so
+    the path is compiled once whatever the values are.
+    """
+    def __new__(cls, context, extlist):
+        self = str.__new__(cls, context + ''.join('[{}="{}"]'.format(option, value) for option, value in extlist))
+        self.path = context + ''.join('[{}=$v{}]'.format(option, i) for i, (option, _) in enumerate(extlist))
+        self.variables = {'v{}'.format(i): str(value) for i, (_, value) in enumerate(extlist)}
+        return self
+
+
+def sniff_root(path, size=4096):
+    """
+    Read the name of the root element, parsing the file only up to its start tag
+
+    @type  size: int
+    @param size: bytes read at once
+
+    @rtype: string
+    @return: local name of the root element
+    """
+    parser = XMLPullParser(events=('start',))
+    for data in SourceFile.open(path).chunks(size):
+        parser.feed(data)
+        for event, node in parser.read_events():
+            return QName(node).localname
+    parser.close()
+    raise NotSuitable("Unknown configuration type")
+
+
 class XMLlikeConfig(Config):
+    prefilter_words = ('<!entity',)
+    # local name of the root element; None in classes whose subclasses are told apart by it
+    root = None
+    # compiled paths shared by the files of a process
+    _xpaths = {}
+
     def __init__(self, path, options):
         Config.__init__(self, path, options)
-        with open(path, 'rb') as f:
-            data = f.read()
-        self.config = fromstring(data.replace(b'\r', b''))
-        self._strip_ns()
+        source = SourceFile.open(path)
+        if options.xml_stream_size is not None and source.size > options.xml_stream_size:
+            self.config = self._stream(source, Log(options.logs_dir))
+            self.namespaced = True
+        else:
+            self.config = self._parse(source)
+            # elements are matched on their local names only when the file declares namespaces
+            self.namespaced = source.data.find(b'xmlns') >= 0
         if self.get_root_name() != self.root:
             raise NotSuitable("Unknown configuration type")
 
-    def _strip_ns(self):
-        for node in self.config.iter():
-            try:
-                has_namespace = node.tag.startswith('{')
-            except AttributeError:
+    @classmethod
+    def resolve(cls, path):
+        if cls.root is not None:
+            return cls
+        root = sniff_root(path)
+        for variant in cls.__subclasses__():
+            if variant.root == root:
+                return variant
+        raise NotSuitable("Unknown configuration type")
+
+    @staticmethod
+    def _parse(source):
+        """
+        Parse the whole file; files mapped to memory are fed to the parser in chunks instead of being
+        copied
+
+        @type  source: SourceFile
+
+        @rtype: Element
+        @return: root of the tree
+        """
+        if isinstance(source.data, bytes):
+            return fromstring(source.data.replace(b'\r', b''))
+        parser = XMLParser()
+        for data in source.chunks():
+            parser.feed(data.replace(b'\r', b''))
+        return parser.close()
+
+    def _stream(self, source, log):
+        """
+        Parse the file incrementally, keeping only the subtrees the rules can reach
+
+        Elements outside of them are removed as soon as they are parsed, unless they are ancestors
+        of a kept subtree.
+
+        @rtype: Element
+        @return: root of the pruned tree
+        """
+        reachable = self._reachable_tags()
+        rss = peak_rss()
+        localnames = {}
+        root = kept = None
+        depth = total = retained = peak = 0
+        for event, node in iterparse(_NoCR(source.chunks()), events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                total += 1
+                retained += 1
+                if root is None:
+                    root = node
+                    if QName(node).localname != self.root:
+                        raise NotSuitable("Unknown configuration type")
+                if kept is None:
+                    tag = localnames.get(node.tag)
+                    if tag is None:
+                        tag = localnames[node.tag] = QName(node).localname
+                    if reachable is None or tag in reachable[0] or (depth == 2 and tag in reachable[1]):
+                        kept = node
                 continue
-            if has_namespace:
-                node.tag = node.tag.split('}', 1)[1]
+            depth -= 1
+            if kept is not None:
+                if node is kept:
+                    kept = None
+            elif node is not root and (not len(node) or next(node.iterchildren(Element), None) is None):
+                peak = max(peak, retained)
+                node.getparent().remove(node)
+                retained -= 1
+        peak = max(peak, retained)
+        # the peak RSS is a high-water mark of the process, raised only by files needing more memory than
+        # any file before them
+        high = peak_rss()
+        log.write("Streamed {}: {} elements, {} retained (peak {}), process peak RSS {} (+{} by this file)".format(
+                  source.name, total, retained, peak, high, high - rss))
+        return root
+
+    def _reachable_tags(self):
+        """
+        Collect tags of the elements the rule xpaths start from
+
+        @rtype: tuple
+        @return: tags of elements at any depth and tags of children of the root, or None if the xpaths
+                 can start from any element
+        """
+        descendants, children = set(), set()
+        for name, contexts in self.ruleset.queries.items():
+            for context in contexts:
+                for c in context:
+                    path = c + ('[{}]'.format(name) if name.startswith('@') else '/' + name)
+                    if path.startswith('.//'):
+                        path, tags = path[3:], descendants
+                    elif path.startswith('./'):
+                        path, tags = path[2:], children
+                    elif path.startswith('.['):
+                        continue
+                    elif path.startswith(('.', '/')):
+                        return None
+                    else:
+                        tags = children
+                    step = re.split(r'[/\[]', path, 1)[0]
+                    if not step:
+                        continue
+                    if not re.match(r'[\w.-]+$', step):
+                        return None
+                    tags.add(step)
+        return descendants, children
 
     def get_root_name(self):
-        return self.config.tag
+        return QName(self.config).localname
+
+    def tag(self, name):
+        """
+        Tag matching the elements of a name, whatever their namespace
+
+        @rtype: string
+        """
+        return '{*}' + name if self.namespaced else name
 
     def get_extended_context(self, context, extlist):
-        ret = []
-        new_c = ''
-        for option, value in extlist:
-            new_c += '[{}="{}"]'.format(option, value)
-        [ret.append(c + new_c) for c in context]
-        return ret
+        return [ExtendedContext(c, extlist) for c in context]
+
+    def findall(self, path):
+        """
+        Find the elements matching a path, compiled to XPath once per process
+
+        @type  path: string or ExtendedContext
+        @param path: ElementPath-like path relative to the root element
+
+        @rtype: list
+        """
+        template = getattr(path, 'path', path)
+        try:
+            query = self._xpaths[(template, self.namespaced)]
+        except KeyError:
+            query = self._xpaths[(template, self.namespaced)] = self._compile(template, self.namespaced)
+        return query(self.config, getattr(path, 'variables', {}))
+
+    @staticmethod
+    def _compile(template, namespaced):
+        """
+        Compile a path to a function of the root element and the XPath variables
+
+        In files with namespaces, names are matched by local-name(), which XPath evaluates element by
+        element; a leading descendant step is run by lxml instead, with a {*} tag.
+
+        @rtype: function
+        """
+        m = DESCENDANT_STEP.match(template) if namespaced else None
+        if m is None or POSITIONAL.search(m.group(2)):
+            xpath = XPath(local_names(template) if namespaced else template)
+            return lambda root, variables: xpath(root, **variables)
+        tag, rest = '{*}' + m.group(1), m.group(2)
+        if not rest:
+            return lambda root, variables: list(root.iterdescendants(tag))
+        xpath = XPath('self::node()' + local_names(rest))
+        return lambda root, variables: [node for start in root.iterdescendants(tag)
+                                        for node in xpath(start, **variables)]
 
 
     def find_nodes(self, name, context=None):
@@ -43,11 +251,74 @@ class XMLlikeConfig(Config):
         realname = name if not isattr else name[1::]
 
         for c in context:
-            path = c + ('[{}]'.format(name) if isattr else '/{}'.format(name))
-            matching = self.config.findall(path)
+            matching = self.findall(c)
+            if isattr:
+                matching = [node for node in matching if realname in node.attrib]
+            else:
+                matching = [node for parent in matching for node in parent.iterchildren(self.tag(name))]
             for node in matching:
                 value = node.text if not isattr else node.attrib[realname]
-                ret.append(MatchingNode(realname, value, node.sourceline, node=node, attribute=isattr))
+                ret.append(MatchingNode(realname, typed(value), node.sourceline, node=node, attribute=isattr))
+        return ret
+
+    def join_nodes(self, name, context, option):
+        if any(c.endswith('/') for c in context):
+            return None
+        ret = {}
+        isattr = name.startswith('@')
+        realname = name[1:] if isattr else name
+        for c in context:
+            for parent in self.findall(c):
+                # same tests as the [@option="value"] and [option="value"] predicates of find_nodes
+                if option.startswith('@'):
+                    value = parent.get(option[1:])
+                    keys = () if value is None else (value,)
+                else:
+                    keys = set("".join(e.itertext()) for e in parent.iterchildren(self.tag(option)))
+                if not keys:
+                    continue
+                if isattr:
+                    if realname not in parent.attrib:
+                        continue
+                    nodes = [MatchingNode(realname, typed(parent.attrib[realname]), parent.sourceline, node=parent,
+                                          attribute=True)]
+                else:
+                    nodes = [MatchingNode(name, typed(node.text), node.sourceline, node=node)
+                             for node in parent.iterchildren(self.tag(name))]
+                for key in keys:
+                    ret.setdefault(key, []).extend(nodes)
+        return ret
+
+    def collect_nodes(self, queries):
+        bases = {}
+        for name, contexts in queries.items():
+            for context in contexts:
+                for c in context:
+                    # "c/" selects descendants of c instead of its children
+                    base = (c.rstrip('/') or '.', c.endswith('/') and not name.startswith('@'))
+                    names = bases.setdefault(base, [])
+                    if (name, c) not in names:
+                        names.append((name, c))
+        found = {}
+        for (path, descendants), names in bases.items():
+            matching = self.findall(path)
+            for name, c in names:
+                found[(name, c)] = self._select(matching, name, descendants)
+        return self._join_contexts(queries, found)
+
+    def _select(self, matching, name, descendants=False):
+        ret = []
+        if name.startswith('@'):
+            realname = name[1:]
+            for node in matching:
+                if realname in node.attrib:
+                    ret.append(MatchingNode(realname, typed(node.attrib[realname]), node.sourceline, node=node,
+                                            attribute=True))
+        else:
+            for parent in matching:
+                tag = self.tag(name)
+                for node in parent.iterdescendants(tag) if descendants else parent.iterchildren(tag):
+                    ret.append(MatchingNode(name, typed(node.text), node.sourceline, node=node))
         return ret
 
     def get_node_value(self, node):
@@ -74,82 +345,66 @@ class XMLlikeConfig(Config):
         return line
 
 
+class _NoCR:
+    """
+    Binary file reader over chunks of a file, dropping carriage returns
+    """
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def read(self, size=-1):
+        for data in self.chunks:
+            ret = data.replace(b'\r', b'')
+            if ret:
+                return ret
+        return b''
+
+
 class ApplicationHostConfig(XMLlikeConfig):
     conftype = 'applicationHost.config'
-
-    def __init__(self, path, options):
-        self.root = "configuration"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "configuration"
 
 
 class DomainXml(XMLlikeConfig):
     conftype = 'domain.xml'
     not_unique = ['jvm-options']
-
-    def __init__(self, path, options):
-        self.root = "domain"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "domain"
 
 
 class MachineConfig(XMLlikeConfig):
     conftype = 'machine.config'
-
-    def __init__(self, path, options):
-        self.root = "configuration"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "configuration"
 
 
 class ServerXml(XMLlikeConfig):
-    def __init__(self, path, options):
-        try:
-            cls = Tomcat(path, options)
-        except NotSuitable:
-            try:
-                cls = Websphere(path, options)
-            except NotSuitable as e:
-                raise e
-        self.__class__ = cls.__class__
-        self.__dict__ = cls.__dict__
+    """
+    server.xml of Tomcat or WebSphere, told apart by the root element
+    """
 
 
 class Tomcat(ServerXml):
     conftype = 'server.xml_tomcat'
-
-    def __init__(self, path, options):
-        self.root = "Server"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "Server"
 
 
 class Websphere(ServerXml):
     conftype = 'server.xml_websphere'
-
-    def __init__(self, path, options):
-        self.root = "server"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "server"
 
 
 class StandaloneXml(XMLlikeConfig):
     conftype = 'standalone.xml'
     not_unique = ['module-option']
-
-    def __init__(self, path, options):
-        self.root = "server"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "server"
 
 
 class WebConfig(XMLlikeConfig):
     conftype = 'web.config'
     not_unique = ['@statusCode', '@users']
-
-    def __init__(self, path, options):
-        self.root = "configuration"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "configuration"
 
 
 class WebXml(XMLlikeConfig):
     conftype = 'web.xml'
     not_unique = ['error-code']
-
-    def __init__(self, path, options):
-        self.root = "web-app"
-        XMLlikeConfig.__init__(self, path, options)
+    root = "web-app"
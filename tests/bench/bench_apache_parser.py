@@ -0,0 +1,140 @@
+"""
+Tokenizing throughput of ApacheParser: single-regex tokenizer against the former per-line class probe, both
+typing directive values as the parser does since values.typed. Both parse loops are run once to check
+that they build the same tree; the rest of the parse time goes to building nodes and indexes, where the
+two are even.
+
+usage: python bench_apache_parser.py [lines]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from apache import ApacheParser, Comment, Directive, Container, ContainerEnd, Node
+from values import typed
+
+
+class LegacyApacheParser(ApacheParser):
+    """Parse loop as it was before the tokenizer, include handling left out, with typed values"""
+
+    def parse(self, path, this_fname=None):
+        fp = open(path)
+        container = start = self.stack.pop()
+
+        lineno = 0
+        for line in fp:
+            lineno = lineno + 1
+            line = line.strip()
+            if not line:
+                continue
+
+            node = self._legacy_node_instance(line)
+            className = node.__class__.__name__
+
+            if className == 'Container':
+                node.path = container.path + (node.name.lower(),)
+                self.stack.append(container)
+                container = node
+                continue
+
+            elif className == 'ContainerEnd':
+                if node.name.lower() != container.name.lower():
+                    raise Exception('Unexpected directive name "%s"' % node.name)
+
+                container.complete = True
+                node = container
+                container = self.stack.pop()
+
+            elif className == 'Directive':
+                node.lineno = lineno
+                node.line = line
+
+            elif className == 'Comment':
+                continue
+
+            container.addNode(node)
+            if className == 'Directive':
+                self._index(node, container.path)
+
+        fp.close()
+        return self
+
+    def _legacy_node_instance(self, line):
+        node_classes = [Comment, Directive, Container, ContainerEnd, Node]
+        for cls in node_classes:
+            result = cls.match(line)
+            if result:
+                if cls is Directive:
+                    result.value = typed(result.value)
+                return result
+
+
+def generate(fname, lines):
+    vhost = [
+        '# virtual host {n}',
+        '<VirtualHost *:{n}>',
+        '    ServerName host{n}.example.com',
+        '    DocumentRoot /var/www/host{n}',
+        '    ServerSignature Off',
+        '    <Directory /var/www/host{n}>',
+        '        Options -Indexes +FollowSymLinks',
+        '        AllowOverride None',
+        '        Require all granted',
+        '    </Directory>',
+        '    ErrorLog logs/host{n}-error.log',
+        '    CustomLog logs/host{n}-access.log combined',
+        '</VirtualHost>',
+        '',
+    ]
+    with open(fname, 'w') as f:
+        f.write('ServerTokens Prod\nTraceEnable off\n')
+        for n in range(lines // len(vhost)):
+            f.write('\n'.join(vhost).format(n=n) + '\n')
+
+
+def dump(nodes):
+    ret = []
+    for node in nodes:
+        ret.append((node.__class__.__name__, node.name, node.value, getattr(node, 'lineno', None)))
+        if isinstance(node, Container):
+            ret.extend(dump(node.nodes))
+    return ret
+
+
+def tokenize(lines):
+    parser = ApacheParser()
+    start = time.perf_counter()
+    for line in lines:
+        parser._get_node_instance(line)
+    t_new = time.perf_counter() - start
+    legacy = LegacyApacheParser()
+    start = time.perf_counter()
+    for line in lines:
+        legacy._legacy_node_instance(line)
+    return time.perf_counter() - start, t_new
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    fname = os.path.join(tempfile.mkdtemp(), 'httpd.conf')
+    generate(fname, lines)
+    old = dump(LegacyApacheParser().parse(fname).container.nodes)
+    new = dump(ApacheParser().parse(fname).container.nodes)
+    assert old == new
+    assert all(type(o[2]) is type(n[2]) for o, n in zip(old, new))
+    with open(fname) as f:
+        stripped = [line.strip() for line in f if line.strip()]
+    runs = [tokenize(stripped) for _ in range(9)]
+    tok_old, tok_new = min(r[0] for r in runs), min(r[1] for r in runs)
+    os.remove(fname)
+    print('{} lines'.format(lines))
+    print('class probe: {:8.3f} s ({:7.0f} lines/s)'.format(tok_old, len(stripped) / tok_old))
+    print('tokenizer:   {:8.3f} s ({:7.0f} lines/s)'.format(tok_new, len(stripped) / tok_new))
+    print('speedup:     {:8.1f}x'.format(tok_old / tok_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Composite rules on large XML configurations: nodes of the following rules grouped by the leading option
+value (hash join) against the former search per leading node
+
+usage: python bench_composite.py [elements]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from main import ConfigAnalyzer, options
+from configs import WebConfig
+
+
+class LegacyAnalyzer(ConfigAnalyzer):
+    """Composite rules searched again in the extended context of every leading node"""
+
+    def _join(self, config, lead, rules, suspects):
+        return None
+
+
+def generate_providers(fname, count):
+    with open(fname, 'w') as f:
+        f.write('<configuration>\n  <system.web>\n    <membership>\n      <providers>\n')
+        for i in range(count):
+            f.write('        <add name="SqlProvider{}" passwordFormat="{}" minRequiredPasswordLength="{}"'
+                    ' minRequiredNonalphanumericCharacters="{}"/>\n'.format(i, ['Clear', 'Hashed'][i % 2],
+                                                                            i % 12, i % 3))
+        f.write('      </providers>\n    </membership>\n  </system.web>\n</configuration>\n')
+
+
+def generate_credentials(fname, count):
+    with open(fname, 'w') as f:
+        f.write('<configuration>\n  <system.web>\n    <authentication mode="Forms">\n      <forms>\n'
+                '        <credentials>\n')
+        for i in range(count):
+            f.write('          <user name="user{}" password="{}"/>\n'.format(i, 'secret{}'.format(i % 50)))
+        f.write('        </credentials>\n      </forms>\n    </authentication>\n  </system.web>\n'
+                '</configuration>\n')
+
+
+def timed(analyzer, config):
+    start = time.perf_counter()
+    vulns = list(analyzer._scan(config))
+    elapsed = time.perf_counter() - start
+    # the nodes found by the run are kept by the configuration, every run starts without them
+    config.release()
+    return elapsed, [v.dump() for v in vulns]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tmp = tempfile.mkdtemp()
+    legacy, planner = LegacyAnalyzer(options, worker=True), ConfigAnalyzer(options, worker=True)
+    print('{} elements'.format(count))
+    print('              search per node   hash join   speedup')
+    for case, generate in [('providers', generate_providers), ('credentials', generate_credentials)]:
+        fname = os.path.join(tmp, 'web.config')
+        generate(fname, count)
+        config = WebConfig(fname, options)
+        t_old, old = min((timed(legacy, config) for _ in range(3)), key=lambda r: r[0])
+        t_new, new = min((timed(planner, config) for _ in range(3)), key=lambda r: r[0])
+        assert old == new, case
+        os.remove(fname)
+        print('{:12} {:14.3f} s {:9.3f} s {:8.1f}x'.format(case, t_old, t_new, t_old / t_new))
+    os.rmdir(tmp)
+
+
+if __name__ == '__main__':
+    main()
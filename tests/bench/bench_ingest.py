@@ -0,0 +1,61 @@
+"""
+File reads per scanned configuration: contents shared through SourceFile against every reader (prefilter,
+root sniffing, parser, content hash, line lookups) opening the file itself
+
+usage: python bench_ingest.py [rounds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from main import ConfigAnalyzer, options
+from sourcefile import SourceFile
+from walker import Walker
+
+CORPUS = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'result', 'input_bad'))
+
+opened = []
+
+
+def audit(event, args):
+    if event == 'open' and isinstance(args[0], str) and args[0].startswith(CORPUS):
+        opened.append(args[0])
+
+
+def reread(cls, fname):
+    """SourceFile.open as if every reader read the file itself"""
+    return cls(fname)
+
+
+def timed(analyzer, files, rounds):
+    del opened[:]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        vulns = []
+        for fname in files:
+            found, meta = analyzer.checkfile(fname, describe=True)
+            vulns.extend(v.dump() for v in found)
+    return time.perf_counter() - start, len(opened), vulns
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    analyzer = ConfigAnalyzer(options, worker=True)
+    files = list(Walker(analyzer.fmapping, options, analyzer.log).walk(CORPUS))
+    sys.addaudithook(audit)
+    shared = SourceFile.open
+    SourceFile.open = classmethod(reread)
+    t_old, n_old, v_old = timed(analyzer, files, rounds)
+    SourceFile.open = shared
+    t_new, n_new, v_new = timed(analyzer, files, rounds)
+    assert v_old == v_new
+    scanned = len(files) * rounds
+    print('{} files, {} rounds'.format(len(files), rounds))
+    print('per reader: {:6.2f} opens/file {:8.3f} s'.format(n_old / scanned, t_old))
+    print('shared:     {:6.2f} opens/file {:8.3f} s'.format(n_new / scanned, t_new))
+
+
+if __name__ == '__main__':
+    main()
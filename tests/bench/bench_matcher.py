@@ -0,0 +1,99 @@
+"""
+Micro-benchmark of Matcher.compare: compiled rule predicates against the former eval-based comparison
+
+usage: python bench_matcher.py [rounds]
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from main import Matcher
+from log import Log
+from rules import RuleSet
+
+
+class LegacyMatcher(Matcher):
+    """Comparison code as it was before rules were compiled to predicates"""
+
+    def compare(self, existing, rule, is_unique=True):
+        nr = rule.not_recommended_values()
+        op = rule.comparison_type()
+        cm = rule.comparison_method()
+        regexp = rule.regexp()
+
+        if nr:
+            rets = [self.do_op(v, existing, op) for v in nr]
+            if eval("{}({})".format(cm, rets)):
+                return self.ALERT
+            return self.OK
+        r = rule.recommended_values()
+        values = regexp if regexp else r
+        rets = [self.do_op(v, existing, op) for v in values]
+        if eval("{}({})".format(cm, rets)):
+            return self.OK
+        return self.ALERT if is_unique else self.SKIP
+
+    def do_op(self, left, right, op):
+        if op == 'equal':
+            return True if str(left).lower() == str(right).lower() else False
+        elif op == 'in':
+            return True if str(left) in str(right) else False
+        elif op in ['<=', '>=', '>', '<']:
+            factor = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+            l = re.match(r"-?(\d+)(.*)", left)
+            r = re.match(r"-?(\d+)(.*)", right)
+            fl = l.group(2).lower()
+            fr = r.group(2).lower()
+            r = int(r.group(1))
+            l = int(l.group(1))
+            if fr:
+                try:
+                    r *= int(factor[fr])
+                except KeyError:
+                    pass
+            if fl:
+                try:
+                    l *= int(factor[fl])
+                except KeyError:
+                    pass
+            return eval("{}{}{}".format(r, op, l))
+        elif op == 'regexp':
+            pattern = re.compile(left)
+            return True if pattern.match(str(right)) else False
+
+
+class Options:
+    user_rules = None
+    logs_dir = None
+
+
+def samples():
+    for conftype in ['apache.conf', 'nginx.conf', 'php.ini', 'web.config', 'server.xml_tomcat']:
+        for rule in RuleSet.get(conftype, Options).rules:
+            for r in rule if isinstance(rule, tuple) else [rule]:
+                yield r, r.default_value()
+                yield r, r.recommended_value()
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    log = Log(Options.logs_dir)
+    cases = list(samples())
+    new, old = Matcher(log), LegacyMatcher(log)
+    for rule, value in cases:
+        assert new.compare(value, rule) == old.compare(value, rule), rule.id()
+
+    t_old = timeit.timeit(lambda: [old.compare(v, r) for r, v in cases], number=rounds)
+    t_new = timeit.timeit(lambda: [new.compare(v, r) for r, v in cases], number=rounds)
+    n = len(cases) * rounds
+    print('{} comparisons'.format(n))
+    print('eval-based:          {:8.3f} us/compare'.format(t_old / n * 1e6))
+    print('compiled predicates: {:8.3f} us/compare'.format(t_new / n * 1e6))
+    print('speedup:             {:8.1f}x'.format(t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+XML report writing: one open report written as findings come against a minidom document per finding
+appended to the report, which is read back and rewritten when the scan stops
+
+usage: python bench_report.py [findings]
+"""
+import os
+import sys
+import tempfile
+import time
+from xml.dom.minidom import Document, Attr
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from httpgen import ReportManager, BadOption, MissingOption
+
+
+class LegacyReportManager(ReportManager):
+    """Report written as it was before it was kept open"""
+
+    def __init__(self, repname):
+        self.report = repname
+        self.f = None
+        with open(self.report, 'w', encoding='utf-8') as f:
+            f.write('')
+
+    def stop(self):
+        with open(self.report, 'r', encoding='utf-8') as f:
+            body = f.read()
+        with open(self.report, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.1" encoding="UTF-8" ?>\n<report>\n%s\n</report>\n' % body)
+
+    def add_vuln(self, vuln):
+        with open(self.report, 'a', encoding='utf-8') as f:
+            f.write(self.build_xml_str(vuln) + '\n')
+
+    def build_xml_str(self, vulner):
+        doc = Document()
+        vuln = doc.createElement('vuln')
+        doc.appendChild(vuln)
+        self._add_pair(doc, vuln, 'entry', vulner.entry)
+        self._add_pair(doc, vuln, 'type', vulner.type)
+        self._add_pair(doc, vuln, 'function', vulner.option)
+        self._add_pair(doc, vuln, 'existing_value', vulner.existing_value)
+        self._add_pair(doc, vuln, 'recommended_value', vulner.recommended_value)
+        self._add_pair(doc, vuln, 'file', vulner.file)
+        vulner.lineno = str(vulner.lineno)
+        self._add_pair(doc, vuln, 'lineno', vulner.lineno)
+        line = vulner.line if not isinstance(vulner.line, Attr) else vulner.line.value
+        self._add_pair(doc, vuln, 'line', line, cdata=True)
+        self._add_pair(doc, vuln, 'place', vulner.place)
+        self._add_pair(doc, vuln, 'exploit', vulner.exploit)
+        return vuln.toprettyxml(indent='  ')
+
+    def _add_pair(self, doc, parent, name, value, cdata=False):
+        name = doc.createElement(name)
+        parent.appendChild(name)
+        name.appendChild(doc.createCDATASection(value) if cdata else doc.createTextNode(value))
+
+
+def findings(count):
+    for i in range(count):
+        if i % 3:
+            vuln = BadOption('/etc/apache2/apache2.conf', '/etc/apache2/conf.d/site & "{}".conf'.format(i % 50),
+                             'apache.conf ServerTokens', 'ServerTokens', 'Full <{}>'.format(i), 'Prod', i,
+                             '<Directory "/var/www/{}"> & ServerTokens Full'.format(i))
+        else:
+            vuln = MissingOption('/etc/nginx/nginx.conf', '/etc/nginx/nginx.conf', 'nginx.conf server_tokens',
+                                 'server_tokens', 'off', 'server_tokens off;')
+        vuln.place = "'0123abcd-{}'".format(i)
+        yield vuln
+
+
+def timed(cls, fname, count):
+    start = time.perf_counter()
+    report = cls(fname)
+    for vuln in findings(count):
+        report.add_vuln(vuln)
+    report.stop()
+    elapsed = time.perf_counter() - start
+    with open(fname, 'rb') as f:
+        return elapsed, f.read()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fname = os.path.join(tempfile.mkdtemp(), 'report.xml')
+    t_old, old = timed(LegacyReportManager, fname, count)
+    t_new, new = timed(ReportManager, fname, count)
+    os.remove(fname)
+    os.rmdir(os.path.dirname(fname))
+    assert old == new
+    print('{} findings, {} bytes'.format(count, len(new)))
+    print('minidom:   {:8.3f} s ({:8.0f} findings/s)'.format(t_old, count / t_old))
+    print('streamed:  {:8.3f} s ({:8.0f} findings/s)'.format(t_new, count / t_new))
+    print('speedup:   {:8.1f}x'.format(t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Load and match of a namespace-heavy standalone.xml: local-name() queries against rewriting every tag
+without its namespace
+
+usage: python bench_xml_namespaces.py [subsystems]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src'))
+
+from main import ConfigAnalyzer, options
+from configs import StandaloneXml
+
+
+class LegacyStandaloneXml(StandaloneXml):
+    """Namespaces stripped from every element after parsing, as before local-name() queries"""
+
+    def __init__(self, path, options):
+        StandaloneXml.__init__(self, path, options)
+        for node in self.config.iter():
+            try:
+                has_namespace = node.tag.startswith('{')
+            except AttributeError:
+                continue
+            if has_namespace:
+                node.tag = node.tag.split('}', 1)[1]
+        self.namespaced = False
+
+
+def generate(fname, subsystems):
+    with open(fname, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<server xmlns="urn:jboss:domain:1.7">\n  <profile>\n')
+        for i in range(subsystems):
+            f.write('    <subsystem xmlns="urn:jboss:domain:example-{}:1.0">\n'.format(i))
+            for j in range(20):
+                f.write('      <resource name="r{}" enabled="true"><property name="p" value="{}"/></resource>\n'
+                        .format(j, j))
+            f.write('    </subsystem>\n')
+        f.write('    <subsystem xmlns="urn:jboss:domain:deployment-scanner:1.1">\n'
+                '      <deployment-scanner path="deployments" scan-interval="5000"/>\n    </subsystem>\n'
+                '    <subsystem xmlns="urn:jboss:domain:web:1.1">\n      <configuration>\n'
+                '        <jsp-configuration x-powered-by="true" display-source-fragment="true"/>\n'
+                '      </configuration>\n    </subsystem>\n  </profile>\n</server>\n')
+
+
+def timed(analyzer, cls, fname):
+    start = time.perf_counter()
+    config = cls(fname, options)
+    loaded = time.perf_counter() - start
+    vulns = [v.dump() for v in analyzer._scan(config)]
+    return loaded, time.perf_counter() - start, vulns
+
+
+def main():
+    subsystems = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    fname = os.path.join(tempfile.mkdtemp(), 'standalone.xml')
+    generate(fname, subsystems)
+    analyzer = ConfigAnalyzer(options, worker=True)
+    l_old, t_old, v_old = min(timed(analyzer, LegacyStandaloneXml, fname) for _ in range(5))
+    l_new, t_new, v_new = min(timed(analyzer, StandaloneXml, fname) for _ in range(5))
+    assert v_old == v_new
+    print('{} subsystems, {} bytes'.format(subsystems, os.path.getsize(fname)))
+    os.remove(fname)
+    print('                 load     load+match')
+    print('strip tags:   {:8.3f} s {:8.3f} s'.format(l_old, t_old))
+    print('local-name(): {:8.3f} s {:8.3f} s'.format(l_new, t_new))
+    print('speedup:      {:8.1f}x  {:8.1f}x'.format(l_old / l_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -22,6 +22,8 @@ def runCore(target, repname, kwargs):
     cmd = ['python', 'main.py', target, '-r', repname]
     if kwargs.get('user_rules'):
         cmd += ['--user-rules', kwargs['user_rules']]
+    if kwargs.get('args'):
+        cmd += kwargs['args']
     proc = subprocess.Popen(cmd, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     try:
         outs, errs = proc.communicate(timeout=15)
@@ -0,0 +1,34 @@
+import os
+from .run import run, vuln
+import pytest
+
+xfail = pytest.mark.xfail
+
+c = os.path.realpath(os.path.join(os.path.dirname(__file__), 'apache_case/apache.conf'))
+j = os.path.realpath(os.path.join(os.path.dirname(__file__), 'apache_continuation/httpd.conf'))
+case, continued = run(c), run(j)
+
+
+def test_server_tokens():
+    expected = vuln('ServerTokens', 'Full', 'Prod')
+    assert expected in case
+
+
+def test_server_signature():
+    expected = vuln('ServerSignature', 'On', 'off')
+    assert expected in case
+
+
+def test_trace_enable_in_container():
+    expected = vuln('TraceEnable', 'on', 'off')
+    assert expected in case
+
+
+def test_continued_line():
+    expected = vuln('ServerTokens', 'Full', 'Prod')
+    assert expected in continued
+
+
+def test_after_continued_line():
+    expected = vuln('ServerSignature', 'On', 'off')
+    assert expected in continued
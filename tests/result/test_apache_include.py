@@ -0,0 +1,23 @@
+import os
+from .run import run, vuln
+import pytest
+
+xfail = pytest.mark.xfail
+
+d = os.path.realpath(os.path.join(os.path.dirname(__file__), 'apache_shared_include'))
+shared = run(os.path.join(d, 'site1')) + run(os.path.join(d, 'site2'))
+both = run(d)
+
+
+def test_include_optional():
+    assert shared.count(vuln('ServerSignature', 'On', 'off')) == 2
+    assert shared.count(vuln('TraceEnable', 'on', 'off')) == 2
+
+
+def test_shared_include_in_one_scan():
+    assert both.count(vuln('ServerSignature', 'On', 'off')) == 2
+    assert both.count(vuln('TraceEnable', 'on', 'off')) == 2
+
+
+def test_recursive_include():
+    assert vuln('ServerTokens', 'Full', 'Prod') not in both
@@ -0,0 +1,74 @@
+import os
+import json
+import socket
+import subprocess
+import tempfile
+import time
+from .run import run, vuln
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Unix domain sockets are not supported")
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+
+
+@pytest.fixture(scope='module')
+def daemon():
+    address = os.path.join(tempfile.mkdtemp(), 'ptconfig.sock')
+    proc = subprocess.Popen(['python', 'main.py', '--daemon', address, '--daemon-timeout', '1'])
+    for _ in range(100):
+        if os.path.exists(address):
+            break
+        time.sleep(0.1)
+    yield address
+    proc.terminate()
+    proc.wait(timeout=15)
+
+
+def scan(address, path, args=()):
+    with socket.socket(socket.AF_UNIX) as s:
+        s.connect(address)
+        f = s.makefile('rwb')
+        f.write((json.dumps({'path': path, 'args': list(args)}) + '\n').encode('utf-8'))
+        f.flush()
+        ret = []
+        for line in f:
+            message = json.loads(line.decode('utf-8'))
+            ret.append(message)
+            if 'vuln' not in message:
+                break
+        return ret
+
+
+def findings(messages):
+    return [vuln(m['vuln']['option'], m['vuln']['existing_value'], m['vuln']['recommended_value'])
+            for m in messages if 'vuln' in m]
+
+
+def test_same_findings(daemon):
+    messages = scan(daemon, b)
+    assert messages[-1]['done']['findings'] == len(messages) - 1
+    assert findings(messages) == run(b)
+
+
+def located(messages):
+    return [(m['vuln']['file'], m['vuln']['option'], m['vuln']['lineno']) for m in messages if 'vuln' in m]
+
+
+def test_warm_scan(daemon):
+    first, second = scan(daemon, b), scan(daemon, b)
+    assert findings(first) == findings(second)
+    assert located(first) == located(second)
+
+
+def test_bad_request(daemon):
+    assert 'error' in scan(daemon, b, ['--jobs', 'x'])[-1]
+
+
+def test_idle_client(daemon):
+    with socket.socket(socket.AF_UNIX) as idle:
+        idle.connect(daemon)
+        start = time.time()
+        assert 'done' in scan(daemon, b)[-1]
+        assert time.time() - start < 15
+        assert idle.recv(1) == b''
@@ -0,0 +1,16 @@
+import os
+from .run import run
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+serial, parallel = run(b), run(b, args=['--jobs', '3'])
+
+
+def test_fp():
+    assert len(parallel) == len(serial)
+
+
+def test_same_order():
+    assert parallel == serial
@@ -0,0 +1,30 @@
+import os
+from .run import runCore, parseResult, getNodeValue
+import pytest
+
+xfail = pytest.mark.xfail
+
+d = os.path.realpath(os.path.join(os.path.dirname(__file__), 'lines'))
+
+
+def lines(src):
+    repname = os.path.join(os.getenv('TEMP'), 'confresult.xml')
+    runCore(src, repname, {})
+    return [tuple(getNodeValue(v, field) for field in ('function', 'lineno', 'line'))
+            for v in parseResult(repname).getElementsByTagName("vuln")]
+
+
+bom, include = lines(os.path.join(d, 'bom')), lines(os.path.join(d, 'include'))
+blank = lines(os.path.join(d, 'blank'))
+
+
+def test_line_after_bom():
+    assert ('ServerTokens', '2', 'ServerTokens Full') in bom
+
+
+def test_line_of_included_file():
+    assert ('TraceEnable', '3', 'TraceEnable on') in include
+
+
+def test_leading_blank_line():
+    assert ('server_tokens', '3', 'server_tokens on;') in blank
@@ -0,0 +1,22 @@
+import os
+import pytest
+from .run import run, vuln
+
+xfail = pytest.mark.xfail
+
+i = os.path.realpath(os.path.join(os.path.dirname(__file__), 'nginx_include/nginx.conf'))
+included = run(i)
+nested = run(os.path.realpath(os.path.join(os.path.dirname(__file__), 'nginx_nested/nginx.conf')))
+
+
+def test_included_options():
+    assert vuln('server_tokens', 'on', 'off') in included
+    assert vuln('ssi', 'on', 'off') in included
+
+
+def test_own_options():
+    assert vuln('autoindex', 'on', 'off') in included
+
+
+def test_nested_include_from_conf_prefix():
+    assert vuln('autoindex', 'on', 'off') in nested
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+from .run import run, vuln
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+cache = os.path.join(tempfile.mkdtemp(), 'parsed')
+serial = run(b)
+first = run(b, args=['--parse-cache', cache])
+second = run(b, args=['--parse-cache', cache])
+
+nginx = os.path.join(tempfile.mkdtemp(), 'nginx_include')
+shutil.copytree(os.path.join(os.path.dirname(__file__), 'nginx_include'), nginx)
+included = run(os.path.join(nginx, 'nginx.conf'), args=['--parse-cache', cache])
+with open(os.path.join(nginx, 'conf.d/security.conf'), 'w') as f:
+    f.write('server_tokens off;\nssi on;\n')
+changed = run(os.path.join(nginx, 'nginx.conf'), args=['--parse-cache', cache])
+
+copies = tempfile.mkdtemp()
+for name, signature in (('a', 'Off'), ('b', 'On')):
+    os.mkdir(os.path.join(copies, name))
+    with open(os.path.join(copies, name, 'apache.conf'), 'w') as f:
+        f.write('Include extra.conf\n')
+    with open(os.path.join(copies, name, 'extra.conf'), 'w') as f:
+        f.write('ServerSignature {}\n'.format(signature))
+copy_b = run(os.path.join(copies, 'b', 'apache.conf'), args=['--parse-cache', cache])
+copy_a = run(os.path.join(copies, 'a', 'apache.conf'), args=['--parse-cache', cache])
+
+
+def test_cache_written():
+    assert os.listdir(cache)
+
+
+def test_first_scan():
+    assert first == serial
+
+
+def test_cached_scan():
+    assert second == serial
+
+
+def test_changed_include():
+    assert vuln('server_tokens', 'on', 'off') in included
+    assert vuln('server_tokens', 'on', 'off') not in changed
+    assert vuln('ssi', 'on', 'off') in changed
+
+
+def test_same_file_in_another_directory():
+    assert vuln('ServerSignature', 'On', 'off') in copy_b
+    assert vuln('ServerSignature', 'On', 'off') not in copy_a
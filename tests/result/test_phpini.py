@@ -7,6 +7,7 @@ xfail = pytest.mark.xfail
 b, m = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad/php.ini')), os.path.realpath(
     os.path.join(os.path.dirname(__file__), 'input_missing/php.ini'))
 bad, missing = run(b), run(m)
+bom = run(os.path.realpath(os.path.join(os.path.dirname(__file__), 'bom/php.ini')))
 
 
 def test_fp():
@@ -202,6 +203,11 @@ def test_missing_enable_dl():
     assert expected in missing
 
 
+def test_expose_php_after_bom():
+    expected = vuln('expose_php', '1', '0')
+    assert expected in bom
+
+
 def test_missing_expose_php():
     expected = vuln('expose_php', 'not set', '0')
     assert expected in missing
@@ -0,0 +1,28 @@
+import os
+from .run import run, vuln
+import pytest
+
+xfail = pytest.mark.xfail
+
+p = os.path.realpath(os.path.join(os.path.dirname(__file__), 'prefilter'))
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+filtered = run(p)
+unfiltered = run(p, args=['--prefilter-size', '0'])
+empty = run(os.path.join(p, 'empty'))
+
+
+def test_same_findings():
+    assert filtered == unfiltered
+
+
+def test_same_findings_for_full_configs():
+    assert run(b) == run(b, args=['--prefilter-size', '0'])
+
+
+def test_present_options():
+    assert vuln('@debug', 'true', 'false') in filtered
+    assert vuln('expose_php', '1', '0') in filtered
+
+
+def test_configuration_without_directives():
+    assert empty == []
@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+from .run import run, runCore, vuln
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+
+
+def report(fmt, suffix=''):
+    repname = os.path.join(os.getenv('TEMP'), 'confresult.' + fmt + suffix)
+    runCore(b, repname, {'args': ['--report-format', fmt]})
+    with (gzip.open if suffix else open)(repname, 'rt', encoding='utf-8') as f:
+        data = f.read()
+    os.remove(repname)
+    return data
+
+
+xml = run(b)
+jsonl = [json.loads(line) for line in report('jsonl').splitlines()]
+sarif = json.loads(report('sarif'))
+sarif_gz = json.loads(report('sarif', '.gz'))
+results = sarif['runs'][0]['results']
+
+
+def test_jsonl_findings():
+    assert [vuln(v['option'], v['existing_value'], v['recommended_value']) for v in jsonl] == xml
+
+
+def test_jsonl_fields():
+    assert all(v['kind'] in ('BadOption', 'MissingOption') and v['place'] for v in jsonl)
+
+
+def test_sarif_version():
+    assert sarif['version'] == '2.1.0'
+
+
+def test_sarif_findings():
+    assert [r['properties'] for r in results] == jsonl
+
+
+def test_sarif_locations():
+    for r in results:
+        location = r['locations'][0]['physicalLocation']
+        assert location['artifactLocation']['uri'].startswith('file://')
+        assert ('region' in location) == (r['properties']['lineno'] > 0)
+
+
+def test_sarif_gzip():
+    assert sarif_gz == sarif
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+from .run import run
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+cache = os.path.join(tempfile.mkdtemp(), 'results')
+copy = os.path.join(tempfile.mkdtemp(), 'input_bad')
+shutil.copytree(b, copy)
+serial = run(b)
+serial_copy = run(copy)
+first = run(b, args=['--result-cache', cache])
+cached_copy = run(copy, args=['--result-cache', cache])
+state = os.path.join(tempfile.mkdtemp(), 'state.json')
+with_state = run(copy, args=['--result-cache', cache, '--state-file', state])
+parallel = run(copy, args=['--result-cache', cache, '--jobs', '3'])
+
+
+def rewrite_entries(change):
+    for name in os.listdir(cache):
+        with open(os.path.join(cache, name)) as f:
+            cached = json.load(f)
+        change(cached)
+        with open(os.path.join(cache, name), 'w') as f:
+            json.dump(cached, f)
+
+
+def replace_values(cached):
+    for fields in cached['findings']:
+        fields['existing_value'] = 'replayed'
+
+
+def other_parser(cached):
+    cached['key'][2] = -1
+
+
+apache = os.path.join(copy, 'apache.conf')
+user_rules = os.path.join(os.path.dirname(__file__), 'user_rules', 'user_rules_example.js')
+rewrite_entries(replace_values)
+replayed = run(copy, args=['--result-cache', cache])
+other_rules = run(apache, args=['--result-cache', cache], user_rules=user_rules)
+serial_other_rules = run(apache, user_rules=user_rules)
+rewrite_entries(other_parser)
+other_version = run(copy, args=['--result-cache', cache])
+
+
+def test_cache_written():
+    assert os.listdir(cache)
+
+
+def test_first_scan():
+    assert first == serial
+
+
+def test_findings_rebuilt_for_copy():
+    assert cached_copy == serial_copy
+
+
+def test_cached_with_state_file():
+    assert with_state == serial_copy
+    assert os.path.exists(state)
+
+
+def test_cached_in_parallel():
+    assert parallel == serial_copy
+
+
+def test_findings_replayed_from_cache():
+    assert len(replayed) == len(serial_copy)
+    assert [v.function for v in replayed] == [v.function for v in serial_copy]
+    # configurations with included files are not cached
+    assert 'replayed' in {v.existing_value for v in replayed}
+    assert all(v.existing_value in ('replayed', s.existing_value) for v, s in zip(replayed, serial_copy))
+
+
+def test_other_rules_miss():
+    assert other_rules == serial_other_rules
+
+
+def test_other_parser_version_miss():
+    assert other_version == serial_copy
@@ -7,6 +7,7 @@ xfail = pytest.mark.xfail
 b, m = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad/websphere/server.xml')), os.path.realpath(
         os.path.join(os.path.dirname(__file__), 'input_missing/websphere/server.xml'))
 bad, missing = run(b), run(m)
+sniffed = run(os.path.realpath(os.path.join(os.path.dirname(__file__), 'server_xml_sniff')))
 
 
 def test_fp():
@@ -27,3 +28,7 @@ def test_displayAuthenticationRealm():
 def test_add_type_suphp():
     expected = vuln('@preserveFullyQualifiedReferrerUrl', 'true', 'false')
     assert expected in bad
+
+
+def test_root_after_long_prolog():
+    assert sniffed == [vuln('@allowLogoutPageRedirectToAnyHost', 'true', 'false')]
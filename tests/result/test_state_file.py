@@ -0,0 +1,53 @@
+import json
+import os
+import tempfile
+from .run import run
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+state = os.path.join(tempfile.mkdtemp(), 'state.json')
+serial = run(b)
+first = run(b, args=['--state-file', state])
+second = run(b, args=['--state-file', state])
+parallel = run(b, args=['--state-file', state, '--jobs', '3'])
+
+
+def rewrite_state(**fields):
+    with open(state) as f:
+        manifest = json.load(f)
+    for entry in manifest['files'].values():
+        entry.update(fields)
+    with open(state, 'w') as f:
+        json.dump(manifest, f)
+
+
+rewrite_state(findings=[])
+emptied = run(b, args=['--state-file', state])
+rewrite_state(findings=[], parser=0)
+other_parser = run(b, args=['--state-file', state])
+
+
+def test_state_written():
+    assert os.path.exists(state)
+
+
+def test_first_scan():
+    assert first == serial
+
+
+def test_unchanged_files_replayed():
+    assert second == serial
+
+
+def test_replayed_in_parallel():
+    assert parallel == serial
+
+
+def test_replayed_from_manifest():
+    assert emptied == []
+
+
+def test_rescanned_with_other_parser_version():
+    assert other_parser == serial
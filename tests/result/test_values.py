@@ -0,0 +1,37 @@
+import os
+from .run import run, vuln
+import pytest
+
+xfail = pytest.mark.xfail
+
+v = os.path.realpath(os.path.join(os.path.dirname(__file__), 'values'))
+php = run(os.path.join(v, 'php'))
+nginx = run(os.path.join(v, 'nginx'), user_rules=os.path.join(v, 'user_rules.js'))
+
+
+def test_sizes():
+    assert vuln('memory_limit', '1G', '128M') in php
+    assert vuln('post_max_size', '8M', '8M') not in php
+    assert vuln('upload_max_filesize', '2097152', '2M') not in php
+
+
+def test_integers():
+    assert vuln('max_execution_time', '300', '30') in php
+    assert vuln('max_input_nesting_level', '64', '64') not in php
+
+
+def test_durations():
+    assert vuln('keepalive_timeout', '2h', '75') in nginx
+    assert vuln('send_timeout', '30s', '60') not in nginx
+
+
+def test_rule_durations():
+    assert vuln('proxy_read_timeout', '1h', '2h') not in nginx
+    assert vuln('client_body_timeout', '90s', '2h') not in nginx
+    assert vuln('client_header_timeout', '3h', '2h') in nginx
+
+
+def test_minutes():
+    assert vuln('lingering_timeout', '10m', '1h') not in nginx
+    assert vuln('lingering_time', '1m', '60') not in nginx
+    assert vuln('resolver_timeout', '2m', '300') not in nginx
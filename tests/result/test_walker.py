@@ -0,0 +1,34 @@
+import os
+from .run import run
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+full = run(b)
+top = run(b, args=['--max-depth', '0'])
+pruned = run(b, args=['--prune-dir', 'tomcat', '--prune-dir', 'websphere'])
+excluded = run(b, args=['--exclude', 'tomcat', '--exclude', 'websphere/server.xml'])
+php = os.path.join(b, 'php.ini')
+
+
+def test_max_depth():
+    assert 0 < len(top) < len(full)
+
+
+def test_prune_dir():
+    assert pruned == top
+
+
+def test_exclude():
+    assert excluded == top
+
+
+def test_max_file_size():
+    assert run(b, args=['--max-file-size', '100']) == []
+
+
+def test_file_target():
+    assert run(php)
+    assert run(php, args=['--exclude', 'php.ini']) == []
+    assert run(php, args=['--max-file-size', '100']) == []
@@ -9,6 +9,9 @@ b, m, c = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad/we
         os.path.join(os.path.dirname(__file__), 'composite/web.config'))
 
 bad, missing, composite = run(b), run(m), run(c)
+p = os.path.realpath(os.path.join(os.path.dirname(__file__), 'composite_providers'))
+providers = run(p)
+namespaced = run(os.path.realpath(os.path.join(os.path.dirname(__file__), 'namespaces')))
 
 
 def test_fp():
@@ -127,6 +130,25 @@ def test_composite_missing_level():
     assert expected in composite
 
 
+def test_composite_providers():
+    assert vuln('@passwordFormat', 'Clear', 'Hashed') in providers
+    assert vuln('@minRequiredPasswordLength', '4', '7') in providers
+    assert vuln('@minRequiredPasswordLength', '6', '7') not in providers
+    assert vuln('@minRequiredNonalphanumericCharacters', '0', '1') in providers
+    assert vuln('@minRequiredPasswordLength', '5', '7') in providers
+
+
+def test_default_namespace():
+    assert len(namespaced) == 24
+    assert vuln('@debug', 'true', 'false') in namespaced
+    assert vuln('@passwordFormat', 'Clear', 'Hashed') in namespaced
+
+
+def test_no_query_memo():
+    assert run(p, args=['--no-query-memo']) == providers
+    assert run(b, args=['--no-query-memo']) == bad
+
+
 def test_connectionProtection():
     expected = vuln('@connectionProtection', 'None', 'Secure')
     assert expected in bad
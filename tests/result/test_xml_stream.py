@@ -0,0 +1,15 @@
+import os
+from .run import run
+import pytest
+
+xfail = pytest.mark.xfail
+
+b = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_bad'))
+m = os.path.realpath(os.path.join(os.path.dirname(__file__), 'input_missing'))
+c = os.path.realpath(os.path.join(os.path.dirname(__file__), 'composite'))
+stream = ['--xml-stream-size', '0']
+
+
+@pytest.mark.parametrize('path', [b, m, c])
+def test_same_findings(path):
+    assert run(path, args=stream) == run(path)
@@ -0,0 +1,66 @@
+[
+{
+    "conftype": "nginx.conf",
+    "name": "keepalive_timeout",
+    "xpath": ["http"],
+    "default": "75s",
+    "recommended": "75",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "send_timeout",
+    "xpath": ["http"],
+    "default": "60s",
+    "recommended": "60",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "proxy_read_timeout",
+    "xpath": ["http"],
+    "default": "60s",
+    "recommended": "2h",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "client_body_timeout",
+    "xpath": ["http"],
+    "default": "60s",
+    "recommended": "2h",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "client_header_timeout",
+    "xpath": ["http"],
+    "default": "60s",
+    "recommended": "2h",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "lingering_timeout",
+    "xpath": ["http"],
+    "default": "5s",
+    "recommended": "1h",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "lingering_time",
+    "xpath": ["http"],
+    "default": "30s",
+    "recommended": "60",
+    "comparison_type": "<="
+},
+{
+    "conftype": "nginx.conf",
+    "name": "resolver_timeout",
+    "xpath": ["http"],
+    "recommended": "300",
+    "value_type": "duration",
+    "comparison_type": "<="
+}
+]